@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+"""
+Reproducible benchmarks for brush creation and preview rendering.
+
+Synthetic grain textures are generated offline from a fixed seed, then each
+case runs in a fresh spawned process so its peak RSS isn't inflated by the
+cases before it. Every case runs over the full grid of the preset's grain
+sizes and brush counts: `name[2048px x100]` is 100 brushes built from
+2048px grains. Brushes cycle through a few distinct sources per size, and
+set-level cases copy those brushes up to the count, so grain size and count
+both vary for real while setup stays affordable. The full preset (8192px x
+1000 brushes for every case) takes hours. Every run is appended to a JSON history file; `compare`
+checks the latest run against a stored baseline and exits non-zero when a
+case got slower or hungrier than the threshold allows.
+
+	python benchmark.py run --preset quick
+	python benchmark.py baseline          # pin the latest run as the baseline
+	python benchmark.py compare --threshold 0.1
+
+Thumbnails are timed twice: `brush_thumbnail` is creator2's QuickLook
+render and always runs, `thumbnail_rendering` is BrushSet-Video's brush card.
+Video cases need BrushSet-Video's dependencies (moviepy) and are reported
+as skipped when they can't be imported. Any other error marks the case as
+failed, and `compare` counts a failed case, or one the baseline measured
+but the latest run skipped, as a regression.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from multiprocessing import get_context
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+here = Path(__file__).parent
+videodir = here.parent.parent/"BrushSet-Video"
+
+benchdir = here/"benchmarks.tmp"
+sourcedir = benchdir/"sources"
+history_file = benchdir/"history.json"
+baseline_file = benchdir/"baseline.json"
+
+PRESETS = {
+	"quick": {"sizes": [512], "counts": [10], "repeat": 3},
+	"standard": {"sizes": [512, 2048], "counts": [10, 100], "repeat": 3},
+	"full": {"sizes": [512, 2048, 8192], "counts": [10, 100, 1000], "repeat": 1},
+}
+
+# distinct synthetic sources per size; brushes cycle through them
+SOURCES_PER_SIZE = 4
+# frames sampled from the preview clip
+VIDEO_FRAMES = 30
+SEED = 1234
+
+
+def synthetic_grain(size, index):
+	"""Deterministic, partly compressible texture: interfering waves plus noise."""
+	import numpy as np
+	from PIL import Image
+
+	rng = np.random.default_rng(SEED + 7919 * size + index)
+	axis = np.linspace(0, 2 * np.pi, size, dtype=np.float32)
+	fx, fy, phase = rng.integers(3, 40), rng.integers(3, 40), rng.uniform(0, np.pi)
+	waves = np.sin(fx * axis + phase)[None, :] * np.cos(fy * axis)[:, None]
+	noise = rng.integers(0, 48, (size, size), dtype=np.uint8)
+	grain = ((waves + 1) * 100).astype(np.uint8) + noise
+	return Image.fromarray(grain, "L")
+
+
+def source_images(size):
+	"""Paths of the cached synthetic sources for `size`, generating them once."""
+	sourcedir.mkdir(parents=True, exist_ok=True)
+	paths = []
+	for i in range(SOURCES_PER_SIZE):
+		path = sourcedir/f"{size}-{i}.png"
+		if not path.exists():
+			synthetic_grain(size, i).save(path)
+		paths.append(path)
+	return paths
+
+
+def redirect_creator(workdir):
+	"""Point creator2's output folders at a scratch directory."""
+	import creator2
+	creator2.outdir = workdir/"brushes"
+	creator2.setdir = workdir/"sets"
+	creator2.outdir.mkdir(exist_ok=True)
+	creator2.setdir.mkdir(exist_ok=True)
+	return creator2
+
+
+def seed_brushes(creator2, size, count):
+	"""Build a brush per `size` source and copy them up to `count`, for set-level cases."""
+	import shutil
+	seeds = []
+	for i, source in enumerate(source_images(size)[:count]):
+		creator2.generate_individual_brush(source, f"seed{i}")
+		seeds.append(creator2.outdir/f"seed{i}.brush")
+	ids = [str(i) for i in range(1, count + 1)]
+	for i, bid in enumerate(ids):
+		shutil.copyfile(seeds[i % len(seeds)], creator2.outdir/f"{bid}.brush")
+	return ids
+
+
+def import_extract():
+	sys.path.insert(0, str(videodir))
+	import extract_brushes
+	return extract_brushes
+
+
+def import_video():
+	extract_brushes = import_extract()
+	import app
+	return app, extract_brushes
+
+
+# Each case takes the grain size, the brush count and a scratch directory,
+# does its setup, and returns (seconds, items) for the timed part only.
+
+def case_individual_brush(size, count, workdir):
+	creator2 = redirect_creator(workdir)
+	sources = source_images(size)
+	start = time.perf_counter()
+	for i in range(count):
+		creator2.generate_individual_brush(sources[i % len(sources)], str(i))
+	return time.perf_counter() - start, count
+
+
+def case_brush_thumbnail(size, count, workdir):
+	import creator2
+	from PIL import Image
+	grains = [Image.open(path).convert("L") for path in source_images(size)]
+	start = time.perf_counter()
+	for i in range(count):
+		creator2.render_thumbnail(grains[i % len(grains)], (1060, 324))
+	return time.perf_counter() - start, count
+
+
+def case_brush_set(size, count, workdir):
+	creator2 = redirect_creator(workdir)
+	ids = seed_brushes(creator2, size, count)
+	start = time.perf_counter()
+	creator2.generate_brush_set(ids, "Bench")
+	return time.perf_counter() - start, count
+
+
+def case_extract_brush(size, count, workdir):
+	creator2 = redirect_creator(workdir)
+	ids = seed_brushes(creator2, size, count)
+	start = time.perf_counter()
+	for bid in ids:
+		creator2.extract_brush_contents(creator2.outdir/f"{bid}.brush", workdir/"extracted"/bid)
+	return time.perf_counter() - start, count
+
+
+def case_extract_brushset(size, count, workdir):
+	creator2 = redirect_creator(workdir)
+	creator2.generate_brush_set(seed_brushes(creator2, size, count), "Bench")
+	extract_brushes = import_extract()
+	start = time.perf_counter()
+	extract_brushes.extract_brushset_info(str(creator2.setdir/"Bench.brushset"), str(workdir/"extracted"))
+	return time.perf_counter() - start, count
+
+
+def case_thumbnail(size, count, workdir):
+	app, extract_brushes = import_video()
+	creator2 = redirect_creator(workdir)
+	creator2.generate_brush_set(seed_brushes(creator2, size, count), "Bench")
+	info = extract_brushes.extract_brushset_info(str(creator2.setdir/"Bench.brushset"), str(workdir/"extracted"))
+	os.chdir(workdir)
+	start = time.perf_counter()
+	for idx, brush in enumerate(info["brushes"]):
+		app.generate_thumbnail_to_brush(brush["path"], str(idx + 1), brush["uuid"])
+	return time.perf_counter() - start, count
+
+
+def case_video_frames(size, count, workdir):
+	app, extract_brushes = import_video()
+	creator2 = redirect_creator(workdir)
+	creator2.generate_brush_set(seed_brushes(creator2, size, count), "Bench")
+	info = extract_brushes.extract_brushset_info(str(creator2.setdir/"Bench.brushset"), str(workdir/"extracted"))
+	os.chdir(workdir)
+	app.random.seed(SEED)
+	clip = app.build_video_clip(info["brushes"], info["name"])
+	start = time.perf_counter()
+	for i in range(VIDEO_FRAMES):
+		clip.get_frame(i * app.total_duration / VIDEO_FRAMES)
+	return time.perf_counter() - start, VIDEO_FRAMES
+
+
+# name -> (function, throughput unit)
+CASES = {
+	"generate_individual_brush": (case_individual_brush, "brushes/s"),
+	"brush_thumbnail": (case_brush_thumbnail, "thumbnails/s"),
+	"generate_brush_set": (case_brush_set, "brushes/s"),
+	"extract_brush_contents": (case_extract_brush, "brushes/s"),
+	"extract_brushset_info": (case_extract_brushset, "brushes/s"),
+	"thumbnail_rendering": (case_thumbnail, "cards/s"),
+	"video_frames": (case_video_frames, "frames/s"),
+}
+
+
+def run_case(name, size, count, repeat):
+	"""Run one case `repeat` times in this (fresh) process, keep the fastest."""
+	sys.path.insert(0, str(here))
+	import instrument
+
+	fn = CASES[name][0]
+	best = None
+	for _ in range(repeat):
+		# the pipelines print progress per brush, keep it out of the report
+		with TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+			cwd = os.getcwd()
+			try:
+				seconds, items = fn(size, count, Path(tmp))
+			finally:
+				os.chdir(cwd)
+		best = seconds if best is None else min(best, seconds)
+	return {"seconds": best, "items": items, "throughput": items / best if best else None, "peak_rss_mb": instrument.peak_rss_mb()}
+
+
+def git_revision():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here, capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def load_json(path, default):
+	if path.exists():
+		with open(path) as f:
+			return json.load(f)
+	return default
+
+
+def run(preset, only=None):
+	settings = PRESETS[preset]
+	results = {}
+	grid = [(size, count) for size in settings["sizes"] for count in settings["counts"]]
+	for name, (_, unit) in CASES.items():
+		if only and name not in only:
+			continue
+		for size, count in grid:
+			key = f"{name}[{size}px x{count}]"
+			print(f"Running {key}...", flush=True)
+			# a fresh interpreter per case keeps peak RSS and caches independent
+			with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+				try:
+					result = executor.submit(run_case, name, size, count, settings["repeat"]).result()
+				except ImportError as e:
+					print(f"  skipped: {e}")
+					results[key] = {"skipped": str(e)}
+					continue
+				except Exception as e:
+					print(f"  failed: {type(e).__name__}: {e}")
+					results[key] = {"failed": f"{type(e).__name__}: {e}"}
+					continue
+			result["unit"] = unit
+			results[key] = result
+			print(f"  {result['seconds']:.3f}s  {result['throughput']:.1f} {unit}  peak {result['peak_rss_mb']:.0f} MiB")
+
+	entry = {
+		"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"revision": git_revision(),
+		"preset": preset,
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"cpus": os.cpu_count(),
+		"results": results,
+	}
+	history = load_json(history_file, [])
+	history.append(entry)
+	benchdir.mkdir(exist_ok=True)
+	with open(history_file, "w") as f:
+		json.dump(history, f, indent=1)
+	print(f"Appended run to {history_file}")
+	return entry
+
+
+def set_baseline(index=-1):
+	history = load_json(history_file, [])
+	if not history:
+		sys.exit("No benchmark runs recorded yet")
+	with open(baseline_file, "w") as f:
+		json.dump(history[index], f, indent=1)
+	print(f"Baseline set to run from {history[index]['time']} ({history[index]['revision']})")
+
+
+def compare(threshold):
+	"""Compare the latest run with the baseline, return the regressed case names."""
+	history = load_json(history_file, [])
+	baseline = load_json(baseline_file, None)
+	if not history or baseline is None:
+		sys.exit("Need both a recorded run and a baseline (benchmark.py baseline)")
+	latest = history[-1]
+
+	regressions = []
+	print(f"{'case':<44} {'baseline s':>11} {'latest s':>11} {'change':>8} {'rss MiB':>15}")
+	for key, result in latest["results"].items():
+		base = baseline["results"].get(key)
+		measured = base and "seconds" in base
+		if "failed" in result or ("skipped" in result and measured):
+			print(f"{key:<44} {'FAILED' if 'failed' in result else 'SKIPPED':>23}  {result.get('failed') or result['skipped']}  REGRESSION")
+			regressions.append(key)
+			continue
+		if not measured or "skipped" in result:
+			print(f"{key:<44} {'not compared':>23}")
+			continue
+		change = result["seconds"] / base["seconds"] - 1
+		rss_change = (result["peak_rss_mb"] or 0) / (base["peak_rss_mb"] or 1) - 1
+		flag = ""
+		if change > threshold or rss_change > threshold:
+			flag = "  REGRESSION"
+			regressions.append(key)
+		print(f"{key:<44} {base['seconds']:>11.3f} {result['seconds']:>11.3f} {change:>+8.1%} {base['peak_rss_mb']:>7.0f}->{result['peak_rss_mb']:<7.0f}{flag}")
+	return regressions
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmark brush creation and preview rendering")
+	sub = parser.add_subparsers(dest="command", required=True)
+	run_parser = sub.add_parser("run", help="run the benchmark matrix and append it to the history")
+	run_parser.add_argument("--preset", choices=PRESETS, default="quick")
+	run_parser.add_argument("--case", action="append", choices=CASES, help="only run these cases")
+	baseline_parser = sub.add_parser("baseline", help="store a recorded run as the baseline")
+	baseline_parser.add_argument("--index", type=int, default=-1, help="history entry to use (default: latest)")
+	compare_parser = sub.add_parser("compare", help="flag regressions of the latest run against the baseline")
+	compare_parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown or RSS growth (0.10 = 10%%)")
+	args = parser.parse_args()
+
+	if args.command == "run":
+		run(args.preset, args.case)
+	elif args.command == "baseline":
+		set_baseline(args.index)
+	else:
+		regressions = compare(args.threshold)
+		if regressions:
+			print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+			sys.exit(1)
+		print("\nNo regressions")
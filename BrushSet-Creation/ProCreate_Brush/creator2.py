@@ -4,18 +4,29 @@ from typing import List
 #!/usr/bin/env python
 
 import re
+import io
 import os
+import sys
 import zipfile
+import plistlib
 from pathlib import Path
-import traceback
+from functools import lru_cache
 from tempfile import TemporaryDirectory
-from shutil import copyfile, make_archive, copytree
+from shutil import which
 from subprocess import run
 from PIL import Image
 from PIL.ImageOps import invert
 import xml.etree.ElementTree as ET
 import numpy as np
 
+import instrument
+from grain_normalize import GrainNormalizer
+from memory_budget import MemoryBudget, open_grain_source, plan_tasks
+from pipeline import Pipeline, Stage
+from texture_filter import filter_sources
+from rawzip import DeflateCache, RawZipWriter, iter_raw_members
+import stroke_preview
+
 here = Path(__file__).parent
 
 indir = here/"Samples.tmp"
@@ -23,6 +34,30 @@ outdir = here/"build_brushes.tmp"
 setdir = here/"build_brush_sets.tmp"
 template = here/"template"
 
+# RAM the worker pool may spend on decoded source images at once
+default_memory_budget_mb = 2048
+
+# threads per brush stage in main(); PNG encode and the LANCZOS resizes are
+# the heavy ones, queues between stages hold at most stage_queue_size brushes
+default_stage_workers = {"decode": 2, "grain": 2, "thumbnail": 2, "encode": 3, "package": 2}
+stage_queue_size = 4
+
+# QuickLook thumbnail: "grain" shows the masked grain, "stroke" a stroke
+# stamped with the grain using the template's spacing and size settings
+thumbnail_style = "grain"
+
+# thumbnails kept in memory for the preview video are resized to the video's
+# card size (BrushSet-Video/app.py image_size) while they're still decoded;
+# each one (RGBA, ~0.44 MB) is charged to the memory budget until the video is
+# rendered, and at most half the budget goes to them; brushes past that get
+# their card from the finished .brushset instead
+video_card_size = (595, 184)
+preview_bytes = video_card_size[0] * video_card_size[1] * 4
+
+# compressed members shared across brushes and sets by content hash, so the
+# signature picture (and any repeated grain) is deflated once per run
+member_cache = DeflateCache()
+
 # Ensure directories exist
 for dir in [indir, outdir, template, setdir]:
 	dir.mkdir(exist_ok=True)
@@ -42,6 +77,7 @@ def center_crop_to_ratio(image, target_ratio):
 		top = (height - new_height) // 2
 		return image.crop((0, top, width, top + new_height))
 
+@lru_cache(maxsize=4)
 def create_radial_mask(size):
 	"""Create radial gradient mask with transparency at edges."""
 	x = np.linspace(-1, 1, size[0])
@@ -51,44 +87,127 @@ def create_radial_mask(size):
 	mask = (1 - np.clip(dist, 0, 1)) * 255
 	return Image.fromarray(mask.astype(np.uint8), "L")
 
-def process_image(input_img, output_path, target_size):
-	"""Process and save image with radial mask."""
+def render_thumbnail(input_img, target_size):
+	"""Crop, resize and apply the radial mask, returning the RGBA thumbnail."""
 	cropped = center_crop_to_ratio(input_img, target_size[0]/target_size[1])
 	resized = cropped.resize(target_size, Image.LANCZOS)
 	mask = create_radial_mask(target_size)
 	
 	rgba = resized.convert("RGBA")
 	rgba.putalpha(mask)
-	rgba.save(output_path)
+	return rgba
+
+def png_bytes(img):
+	"""Encode an image as PNG in memory."""
+	buffer = io.BytesIO()
+	img.save(buffer, "PNG")
+	return buffer.getvalue()
+
+@lru_cache(maxsize=1)
+def signature_members():
+	"""(name, bytes) of the template Signature folder, read once per process."""
+	return tuple(
+		(f"Signature/{f.name}", f.read_bytes())
+		for f in sorted((template/"Signature").iterdir()) if f.is_file() and not f.name.startswith(".")
+	)
 
 # Core brush generation functionality
-def generate_individual_brush(source_image_path, brush_id):
+#
+# A brush is built in stages that pass a job dict along: decode the source,
+# transform the grain, render the thumbnail, encode both PNGs, then write the
+# settings and package everything straight into the .brush zip. main() runs
+# the stages as a pipeline so different brushes overlap; generate_individual_brush
+# runs them back to back for a single brush.
+
+def new_brush_job(source_image_path, brush_id, normalizer=None, brush_dir=None):
+	"""Describe one brush to build."""
+	return {
+		"brush_id": brush_id,
+		"source": source_image_path,
+		"normalizer": normalizer,
+		"path": (brush_dir or outdir)/f"{brush_id}.brush",
+	}
+
+def decode_stage(job):
+	"""Decode the source image to L, at reduced resolution when it'll be downscaled."""
+	print(f"Processing grain image for {job['source']}")
+	normalizer = job["normalizer"]
+	with instrument.stage("decode", brush=job["brush_id"]):
+		if isinstance(job["source"], Image.Image):
+			# already decoded, e.g. rasterized from an SVG by svg_raster
+			job["grain"], job["source_size"] = job["source"].convert("L"), job["source"].size
+		else:
+			job["grain"], job["source_size"] = open_grain_source(job["source"], normalizer.max_edge if normalizer else None)
+	return job
+
+def grain_stage(job):
+	"""Apply grain normalization."""
+	normalizer = job["normalizer"]
+	if normalizer and normalizer.active:
+		with instrument.stage("grain", brush=job["brush_id"]):
+			job["grain"] = normalizer(job["grain"], job["source_size"])
+	return job
+
+def thumbnail_stage(job):
+	"""Render the QuickLook thumbnail from the grain."""
+	print(f"Creating thumbnail for {job['brush_id']}")
+	with instrument.stage("thumbnail", brush=job["brush_id"], style=thumbnail_style):
+		if thumbnail_style == "stroke":
+			job["thumbnail"] = stroke_preview.render_stroke(job["grain"], stroke_preview.archive_settings(template/"Brush.archive"), (1060, 324))
+		else:
+			job["thumbnail"] = render_thumbnail(job["grain"], (1060, 324))
+	return job
+
+def encode_stage(job):
+	"""Encode grain and thumbnail to PNG, dropping the decoded images."""
+	with instrument.stage("encode", brush=job["brush_id"]):
+		job["grain_png"] = png_bytes(job.pop("grain"))
+		if job["normalizer"]:
+			job["normalizer"].add_encoded(len(job["grain_png"]))
+		thumbnail = job.pop("thumbnail")
+		if job.get("preview_size"):
+			# kept for the preview video, already at card size so it's never decoded again
+			job["preview"] = thumbnail.resize(job["preview_size"], Image.LANCZOS)
+		job["thumbnail_png"] = png_bytes(thumbnail)
+	return job
+
+def package_stage(job):
+	"""Write brush settings and all members into the .brush package."""
+	brush_id = job["brush_id"]
+	print(f"Processing brush settings for {brush_id}")
+	with instrument.stage("settings", brush=brush_id):
+		settings = brush_settings_bytes(brush_id)
+
+	print(f"Packaging brush {brush_id}")
+	with instrument.stage("package", brush=brush_id):
+		members = [
+			("Brush.archive", settings),
+			("Grain.png", job.pop("grain_png")),
+			("QuickLook/Thumbnail.png", job.pop("thumbnail_png")),
+			*signature_members(),
+		]
+		write_brush_package(members, job["path"])
+	return job
+
+BRUSH_STAGES = (decode_stage, grain_stage, thumbnail_stage, encode_stage, package_stage)
+
+def generate_individual_brush(source_image_path, brush_id, normalizer=None, brush_dir=None):
 	"""Generate a single Procreate brush from source image."""
 	print(f"Generating brush for {source_image_path} with ID {brush_id}")
-	with TemporaryDirectory() as tmpdir:
-		temp_dir = Path(tmpdir)
-		
-		# Process brush settings
-		print(f"Processing brush settings for {brush_id}")
-		process_brush_settings(temp_dir, brush_id)
-		
-		# Process grain image
-		print(f"Processing grain image for {source_image_path}")
-		grain_img = process_grain_image(source_image_path)
-		grain_img.save(temp_dir/"Grain.png")
-		
-		# Create thumbnail
-		print(f"Creating thumbnail for {brush_id}")
-		(temp_dir/"QuickLook").mkdir(exist_ok=True)
-		process_image(grain_img, temp_dir/"QuickLook/Thumbnail.png", (1060, 324))
-		
-		# Copy signature
-		print(f"Copying signature for {brush_id}")
-		copytree(template/"Signature", temp_dir/"Signature", dirs_exist_ok=True)
-		
-		# Package brush
-		print(f"Packaging brush {brush_id}")
-		create_brush_package(temp_dir, outdir/f"{brush_id}.brush")
+	job = new_brush_job(source_image_path, brush_id, normalizer, brush_dir)
+	for stage in BRUSH_STAGES:
+		job = stage(job)
+	return job
+
+def xml_uids_to_binary(value):
+	"""Turn XML {'CF$UID': n} references into real UIDs, as plutil does for binary1."""
+	if isinstance(value, dict):
+		if len(value) == 1 and "CF$UID" in value:
+			return plistlib.UID(value["CF$UID"])
+		return {k: xml_uids_to_binary(v) for k, v in value.items()}
+	if isinstance(value, list):
+		return [xml_uids_to_binary(v) for v in value]
+	return value
 
 def process_brush_settings(output_dir, brush_id):
 	"""Generate and convert brush settings plist."""
@@ -107,27 +226,34 @@ def process_brush_settings(output_dir, brush_id):
 	elif os.name == "nt":
 		executable = "bin.tmp/plutil.exe"
 
-	run([executable, "-convert", "binary1", str(settings_file)], check=True)
+	if which(executable) is None:
+		# no plutil here (e.g. Linux build boxes), plistlib writes the same bplist00
+		with open(settings_file, "rb") as f:
+			data = xml_uids_to_binary(plistlib.load(f))
+		with open(settings_file, "wb") as f:
+			plistlib.dump(data, f, fmt=plistlib.FMT_BINARY, sort_keys=False)
+		return
 
-def process_grain_image(img_path):
-	"""Process grain image with inversion and alpha handling."""
-	img = Image.open(img_path)
-	
-	return img.convert("L")
+	run([executable, "-convert", "binary1", str(settings_file)], check=True)
 
-def create_brush_package(source_dir, output_path):
-	"""Create final .brush package from directory contents."""
-	if output_path.exists():
-		output_path.unlink()
-	make_archive(str(output_path), "zip", source_dir)
+def brush_settings_bytes(brush_id):
+	"""Return the binary Brush.archive for brush_id."""
+	with TemporaryDirectory() as tmpdir:
+		process_brush_settings(Path(tmpdir), brush_id)
+		return (Path(tmpdir)/"Brush.archive").read_bytes()
 
-	# check if the zip is being used by another process, if so, wait
-	
+def write_brush_package(members, output_path):
+	"""Create final .brush package from (name, bytes) members, with folder entries like make_archive."""
+	# check if the brush is being used by another process, if so, wait
 	for i in range(10):
 		try:
-			(Path(f"{output_path}.zip")).rename(output_path)
+			with RawZipWriter(output_path, cache=member_cache) as zw:
+				for name, data in members:
+					if "/" in name:
+						zw.write_dir(name.rsplit("/", 1)[0] + "/")
+					zw.write_bytes(name, data)
 			break
-		except:
+		except PermissionError:
 			print(f"Waiting for {output_path} to be released")
 			time.sleep(1)
 
@@ -136,17 +262,18 @@ def extract_brush_contents(brush_file, target_dir):
 	with zipfile.ZipFile(brush_file) as zf:
 		zf.extractall(target_dir)
 
-def create_brushset_package(source_dir, output_path):
-	"""Package brush set directory into .brushset file."""
-	if output_path.exists():
-		output_path.unlink()
-	make_archive(str(output_path), "zip", source_dir)
-	Path(f"{output_path}.zip").rename(output_path)
+def generate_brush_set(brush_ids: List[str], set_name: str, brush_dir: Path = None, previews: dict = None):
+	"""
+	Generate a Procreate brush set with UUID-based folder structure.
 
-def generate_brush_set(brush_ids: List[str], set_name: str):
-	"""Generate a Procreate brush set with UUID-based folder structure."""
+	Returns the set's name, path and brushes (brush id and UUID, plus the
+	in-memory preview `image` for brush ids found in `previews`), the same
+	shape extract_brushes.extract_brushset_info gives the video renderer.
+	"""
+	brush_dir = brush_dir or outdir
+	previews = previews or {}
 	print(f"Generating brush set {set_name} with brush IDs: {brush_ids}")
-	with TemporaryDirectory() as tmpdir:
+	with instrument.stage("set assembly", set=set_name, brushes=len(brush_ids)), TemporaryDirectory() as tmpdir, RawZipWriter(setdir/f"{set_name}.brushset", cache=member_cache) as zw:
 		temp_dir = Path(tmpdir)
 		uuids = []
 		
@@ -155,14 +282,12 @@ def generate_brush_set(brush_ids: List[str], set_name: str):
 			brush_uuid = str(uuid.uuid4()).upper()
 			uuids.append(brush_uuid)
 			
-			# Create UUID-named directory for this brush
-			brush_dir = temp_dir / brush_uuid
-			brush_dir.mkdir(exist_ok=True)
-			
-			# Extract source brush contents into UUID directory
-			print(f"Extracting contents for brush {bid} into {brush_uuid}")
-			with zipfile.ZipFile(outdir/f"{bid}.brush", 'r') as zf:
-				zf.extractall(brush_dir)
+			# Copy source brush members into the UUID directory as their
+			# already-compressed bytes, nothing is inflated or deflated again
+			print(f"Copying contents for brush {bid} into {brush_uuid}")
+			zw.write_dir(f"{brush_uuid}/")
+			for member in iter_raw_members(brush_dir/f"{bid}.brush"):
+				zw.write_raw(member, f"{brush_uuid}/{member.name}")
 		
 		# Create brushset manifest
 		print(f"Creating brushset manifest for {set_name}")
@@ -170,7 +295,41 @@ def generate_brush_set(brush_ids: List[str], set_name: str):
 		
 		# Package brush set
 		print(f"Packaging brush set {set_name}")
-		create_brushset_package(temp_dir, setdir/f"{set_name}.brushset")
+		zw.write_bytes("brushset.plist", (temp_dir/"brushset.plist").read_bytes())
+
+	brushes = []
+	for bid, brush_uuid in zip(brush_ids, uuids):
+		brush = {"brush_id": bid, "uuid": brush_uuid}
+		if bid in previews:
+			brush["image"] = previews[bid]
+		brushes.append(brush)
+	return {"name": set_name, "path": setdir/f"{set_name}.brushset", "brushes": brushes}
+
+def render_set_video(set_info: dict, video_dir: Path):
+	"""
+	Render the preview video for a set straight from its in-memory thumbnails.
+
+	Brushes without one (past the preview share of the memory budget) read
+	theirs from the written .brushset, the way BrushSet-Video/app.py does.
+	"""
+	# BrushSet-Video pulls in moviepy, only load it when a video is wanted
+	video_app_dir = here.parent.parent/"BrushSet-Video"
+	if str(video_app_dir) not in sys.path:
+		sys.path.insert(0, str(video_app_dir))
+	import app
+	import extract_brushes
+
+	video_dir.mkdir(parents=True, exist_ok=True)
+	output_file = video_dir/f"{set_info['name']}.mp4"
+	print(f"Rendering preview video {output_file}")
+	with instrument.stage("video", set=set_info["name"], brushes=len(set_info["brushes"])), TemporaryDirectory() as tmpdir:
+		brushes = set_info["brushes"]
+		if any("image" not in brush for brush in brushes):
+			extracted = extract_brushes.extract_brushset_info(str(set_info["path"]), tmpdir)
+			paths = {brush["uuid"]: brush["path"] for brush in extracted["brushes"]}
+			brushes = [brush if "image" in brush else dict(brush, path=paths[brush["uuid"]]) for brush in brushes]
+		app.generate_video(brushes, brush_name=set_info["name"], output_file=str(output_file), save_cards=False)
+	return output_file
 
 def create_brushset_manifest(output_dir: Path, uuids: List[str], set_name: str):
 	"""Generate brushset.plist with proper UUIDs."""
@@ -206,19 +365,9 @@ def create_brushset_manifest(output_dir: Path, uuids: List[str], set_name: str):
 	print(f"brushset.plist created for {set_name}")
 
 
-from concurrent.futures import ThreadPoolExecutor
-def main(folder: Path, folder_name: str):
-	"""Generate brushes and brush sets for all images in input directory."""
-	# use threadpool to generate brushes in parallel
-
-	executor = ThreadPoolExecutor(max_workers=4)
-	executions = []
-
-	print("Starting brush generation process")
-	brush_ids = []
-	
+def find_sources(folder: Path):
+	"""Return (brush_id, image path) for every numbered image in folder, sorted by brush_id."""
 	to_do_dict = []
-	# Generate individual brushes first
 	for img_file in folder.iterdir():
 		if img_file.is_file() and (match := re.match(r"(\d+)", img_file.stem)):
 			brush_id = match.group(1)
@@ -227,24 +376,77 @@ def main(folder: Path, folder_name: str):
 
 	# sort by brush_id
 	to_do_dict.sort(key=lambda x: int(x[0]))
+	return to_do_dict
+
+
+def main(folder: Path, folder_name: str, memory_budget_mb: int = default_memory_budget_mb, normalizer: GrainNormalizer = None, stage_workers: dict = None, texture_filter: str = None, video_dir: Path = None):
+	"""Generate brushes and brush sets for all images in input directory."""
+	# run the brush stages as a pipeline so decode, compute and disk work of
+	# different brushes overlap, admitting each brush against the memory
+	# budget at decode so several huge sources can't be in flight at once
 
-	def action(bid=brush_id, img=img_file):
-		generate_individual_brush(img, bid)
-		brush_ids.append(bid)
-		print(f"Generated brush: {bid}")
+	budget = MemoryBudget(memory_budget_mb * 1024**2)
+	workers = {**default_stage_workers, **(stage_workers or {})}
 
+	print("Starting brush generation process")
+	brush_ids = []
+	previews = {}
 	
+	# Generate individual brushes first
+	to_do_dict = find_sources(folder)
 
-	for brush_id, img_file in to_do_dict:
-		executions.append(executor.submit(action, brush_id, img_file))
+	# drop (or flag) blank and duplicate textures before any brush work
+	skipped = []
+	if texture_filter:
+		with instrument.stage("texture filter", set=folder_name, sources=len(to_do_dict)):
+			to_do_dict, built_pixels, skipped = filter_sources(to_do_dict, texture_filter, memory_budget_mb=memory_budget_mb)
 
+	# estimate decoded sizes from the headers before anything is scheduled
+	tasks = plan_tasks(to_do_dict, normalizer.max_edge if normalizer else None)
 
-	# Wait for all brush generation tasks to complete
-	for execution in executions:
-		try:
-			execution.result()
-		except Exception as e:
-			traceback.print_exception(type(e), e, e.__traceback__)
+	# previews outlive their brush job, so their reservation is held until the video is done
+	preview_share = budget.limit // 2
+	previews_planned = 0
+
+	def admit(job):
+		budget.acquire(job["estimate"] + job.get("preview_bytes", 0), label=job["brush_id"])
+		job["reserved"] = True
+		return decode_stage(job)
+
+	def finished(job, error):
+		if job.pop("reserved", False):
+			budget.release(job["estimate"])
+			if "preview" not in job or error is not None:
+				budget.release(job.get("preview_bytes", 0))
+		if error is None:
+			brush_ids.append(job["brush_id"])
+			if "preview" in job:
+				previews[job["brush_id"]] = job.pop("preview")
+			print(f"Generated brush: {job['brush_id']}")
+
+	def jobs():
+		nonlocal previews_planned
+		for brush_id, img_file, estimate in tasks:
+			print(f"Generating brush for {img_file} with ID {brush_id}")
+			job = new_brush_job(img_file, brush_id, normalizer)
+			job["estimate"] = estimate
+			if video_dir and previews_planned + preview_bytes <= preview_share:
+				job["preview_size"] = video_card_size
+				job["preview_bytes"] = preview_bytes
+				previews_planned += preview_bytes
+			yield job
+
+	stage_fns = {"decode": admit, "grain": grain_stage, "thumbnail": thumbnail_stage, "encode": encode_stage, "package": package_stage}
+	pipeline = Pipeline([Stage(name, fn, workers[name], stage_queue_size) for name, fn in stage_fns.items()], on_exit=finished)
+	cpu_start = time.process_time()
+	pipeline.run(jobs())
+	pipeline_cpu = time.process_time() - cpu_start
+	pipeline.report()
+	if skipped and texture_filter == "drop" and built_pixels:
+		# brush cost scales with source pixels, so price the skipped ones at this run's rate
+		saved = pipeline_cpu / built_pixels * sum(pixels for *_, pixels in skipped)
+		print(f"Texture filter: skipped {len(skipped)} sources, an estimated {saved:.1f}s of CPU saved ({pipeline_cpu:.1f}s spent on {len(to_do_dict)})")
+	print(f"Peak reserved memory: {budget.peak / 2**20:.0f} MiB of {memory_budget_mb} MiB budget")
 	
 	# Segment into sets of maximum 100 brushes
 	if brush_ids:
@@ -267,20 +469,71 @@ def main(folder: Path, folder_name: str):
 		# print(f"\nTotal brush sets generated: {total_sets}")
 
 		set_name = folder_name
-		generate_brush_set(brush_ids, set_name)
+		set_info = generate_brush_set(brush_ids, set_name, previews=previews)
+		if video_dir:
+			render_set_video(set_info, video_dir)
+		budget.release(len(previews) * preview_bytes)
+		previews.clear()
 	else:
 		print("\nNo valid brushes found in input directory")
+
 	
 	print("\nBrush generation process completed")
 
+	if normalizer and normalizer.active:
+		report = normalizer.report(folder_name)
+		stretched = f", {report['stretched']} non-square grains stretched to squares" if report["stretched"] else ""
+		print(f"Grain normalization: {report['resized']}/{report['brushes']} grains resized{stretched}, {report['saved_bytes'] / 2**20:.1f} MiB of decoded grain saved ({report['saved_percent']:.0f}%), {report['png_bytes'] / 2**20:.1f} MiB of Grain.png shipped")
+		return report
+
+def parse_stage_workers(text):
+	"""Parse 'decode=2,encode=4' into a stage -> threads dict."""
+	workers = {}
+	for part in text.split(","):
+		name, _, count = part.partition("=")
+		if name.strip() not in default_stage_workers or not count.strip().isdigit() or int(count) < 1:
+			raise ValueError(f"Expected STAGE=N with STAGE in {list(default_stage_workers)}, got {part!r}")
+		workers[name.strip()] = int(count)
+	return workers
+
 if __name__ == "__main__":
+	import argparse
+	parser = argparse.ArgumentParser(description="Build Procreate brushes and brush sets from Samples.tmp")
+	parser.add_argument("--memory-budget-mb", type=int, default=default_memory_budget_mb, help="RAM budget for decoded source images across worker threads")
+	parser.add_argument("--grain-max-edge", type=int, default=None, help="downscale grains to this edge, decoding large sources at reduced resolution")
+	parser.add_argument("--grain-power-of-two", action="store_true", help="snap grains to power-of-two squares (non-square grains are stretched, not cropped, to keep them tileable)")
+	parser.add_argument("--no-seamless", dest="seamless", action="store_false", help="resample grains without wrapping around the tile edges")
+	parser.add_argument("--stage-workers", type=parse_stage_workers, default=None, metavar="STAGE=N,...", help=f"threads per pipeline stage, default {','.join(f'{k}={v}' for k, v in default_stage_workers.items())}")
+	parser.add_argument("--texture-filter", choices=("drop", "flag"), default=None, help="skip (or just report) blank and duplicate source textures")
+	parser.add_argument("--video-dir", type=Path, default=None, help="also render each set's preview video here, from the in-memory thumbnails")
+	parser.add_argument("--thumbnail-style", choices=("grain", "stroke"), default=thumbnail_style, help="QuickLook thumbnail: the masked grain, or a stroke drawn with the brush")
+	instrument.add_arguments(parser)
+	args = parser.parse_args()
+	instrument.configure(args.metrics, args.metrics_file)
+	thumbnail_style = args.thumbnail_style
+
+	reports = []
+
 	start = time.time()
 	for folder in indir.iterdir():
 		if folder.is_dir():
 			folder_name = folder.name
 			print(f"Processing folder {folder}")
-			main(folder, folder_name)
+			normalizer = GrainNormalizer(args.grain_max_edge, args.grain_power_of_two, args.seamless)
+			report = main(folder, folder_name, args.memory_budget_mb, normalizer, args.stage_workers, args.texture_filter, args.video_dir)
+			if report:
+				reports.append(report)
 		else:
 			print(f"Skipping {folder}")
+
+	if reports:
+		print("\nGrain normalization report (decoded grain at source size -> normalized size, Grain.png shipped)")
+		for report in reports:
+			print(f"{report['set']:<32} {report['brushes']:>5} brushes  {report['source_bytes'] / 2**20:>9.1f} MiB -> {report['grain_bytes'] / 2**20:>9.1f} MiB  saved {report['saved_bytes'] / 2**20:>9.1f} MiB  Grain.png {report['png_bytes'] / 2**20:>9.1f} MiB")
+		print(f"{'Total saved':<32} {sum(r['saved_bytes'] for r in reports) / 2**20:>53.1f} MiB")
+
+	dedup = member_cache.report()
+	instrument.report()
+	print(f"\nMember dedup: {dedup['hits']} of {dedup['hits'] + dedup['misses']} members reused, {dedup['bytes_reused'] / 2**20:.1f} MiB of compressed bytes shared, {dedup['cpu_saved']:.2f}s compression CPU saved ({dedup['cpu_hashing']:.2f}s spent hashing)")
 	print(f"Time taken: {time.time()-start:.2f} seconds")
 	
\ No newline at end of file
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+Merge, split and subset .brushset files without recompressing anything.
+
+Brushes are picked out of the inputs by UUID, by the name stored in their
+Brush.archive or by position, and their members are copied into the new set as
+raw compressed bytes; only brushset.plist is written fresh (through
+create_brushset_manifest). Nothing is inflated except the Brush.archive of
+brushes that are matched by name, so the speed is that of reading and writing
+the files.
+
+	python curate_brushset.py merge A.brushset B.brushset -o Combined.brushset
+	python curate_brushset.py merge A.brushset --brush-name "Brick*" --index 1-3 -o Picks.brushset
+	python curate_brushset.py split A.brushset --size 20
+
+A subset is a merge of one input with a filter. Plain .brush files can be
+merged in too; each one gets a fresh UUID.
+"""
+
+import argparse
+import plistlib
+import sys
+import time
+import uuid
+import zipfile
+from fnmatch import fnmatchcase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import creator2
+from rawzip import RawZipWriter, read_raw
+
+# Brush.archive names are read by the video app's extraction module
+video_app_dir = Path(__file__).parent.parent.parent/"BrushSet-Video"
+if str(video_app_dir) not in sys.path:
+	sys.path.insert(0, str(video_app_dir))
+from extract_brushes import brush_name
+
+
+class SourceBrush:
+	"""One brush inside an input file: its UUID and the zip entries that make it up."""
+
+	def __init__(self, source, uid, infos, prefix):
+		self.source = source
+		self.uuid = uid
+		self.infos = infos
+		self.prefix = prefix  # "<UUID>/" in a brushset, "" in a .brush
+		self._name = None
+
+	@property
+	def name(self):
+		"""The brush name from Brush.archive, read on first use."""
+		if self._name is None:
+			self._name = brush_name(self.source.read(self.prefix + "Brush.archive"))
+		return self._name
+
+
+def read_brushes(zf):
+	"""List the brushes of an open .brush or .brushset, in manifest order."""
+	path = Path(zf.filename)
+	if path.suffix == ".brush":
+		return [SourceBrush(zf, None, zf.infolist(), "")]
+
+	manifest = plistlib.loads(zf.read("brushset.plist"))
+	members = {}
+	for info in zf.infolist():
+		folder, sep, _ = info.filename.partition("/")
+		if sep:
+			members.setdefault(folder, []).append(info)
+	brushes = []
+	for uid in manifest.get("brushes", []):
+		if uid not in members:
+			print(f"Skipping {uid} in {path.name}: listed in brushset.plist but has no folder")
+			continue
+		brushes.append(SourceBrush(zf, uid, members[uid], uid + "/"))
+	return brushes
+
+
+def parse_index_spec(text):
+	"""Turn '1,4-6' into {1, 4, 5, 6} (positions are 1-based)."""
+	positions = set()
+	for part in text.split(","):
+		first, sep, last = part.strip().partition("-")
+		try:
+			start = int(first)
+			end = int(last) if sep else start
+		except ValueError:
+			raise argparse.ArgumentTypeError(f"Expected positions like 1,4-6, got {text!r}")
+		if start < 1 or end < start:
+			raise argparse.ArgumentTypeError(f"Bad position range {part!r}")
+		positions.update(range(start, end + 1))
+	return positions
+
+
+def select(brushes, uuids=None, names=None, positions=None):
+	"""
+	Filter `brushes` by UUID, name pattern (fnmatch, case-insensitive) or
+	1-based position. A brush is kept when it matches any given filter; with no
+	filters everything is kept.
+	"""
+	if not (uuids or names or positions):
+		return list(brushes)
+	uuids = {u.upper() for u in uuids or ()}
+	names = [n.lower() for n in names or ()]
+	positions = positions or set()
+	picked = []
+	for position, brush in enumerate(brushes, 1):
+		if (
+			position in positions
+			or (brush.uuid and brush.uuid.upper() in uuids)
+			or (names and any(fnmatchcase(brush.name.lower(), n) for n in names))
+		):
+			picked.append(brush)
+	return picked
+
+
+def write_brushset(brushes, output, set_name, on_collision="error"):
+	"""
+	Write `brushes` into a new .brushset at `output`, copying members raw.
+
+	`on_collision` decides what happens when two brushes share a UUID:
+	"error" stops, "skip" keeps the first, "reassign" gives the later one a
+	fresh UUID. Returns the UUIDs written, in order.
+	"""
+	output = Path(output)
+	output.parent.mkdir(parents=True, exist_ok=True)
+	uuids = []
+	with TemporaryDirectory() as tmpdir, RawZipWriter(output) as zw:
+		for brush in brushes:
+			uid = brush.uuid or str(uuid.uuid4()).upper()
+			if uid in uuids:
+				if on_collision == "skip":
+					print(f"Skipping duplicate brush {uid} from {brush.source.filename}")
+					continue
+				if on_collision != "reassign":
+					raise ValueError(f"Brush {uid} appears more than once (use --on-collision skip or reassign)")
+				uid = str(uuid.uuid4()).upper()
+				print(f"Reassigned duplicate brush {brush.uuid} from {brush.source.filename} to {uid}")
+			uuids.append(uid)
+
+			zw.write_dir(f"{uid}/")
+			# in header order, so each input is read front to back
+			for info in sorted(brush.infos, key=lambda i: i.header_offset):
+				name = uid + "/" + info.filename[len(brush.prefix):]
+				if name.endswith("/"):
+					zw.write_dir(name)
+				else:
+					zw.write_raw(read_raw(brush.source, info), name)
+
+		creator2.create_brushset_manifest(Path(tmpdir), uuids, set_name)
+		zw.write_bytes("brushset.plist", (Path(tmpdir)/"brushset.plist").read_bytes())
+	return uuids
+
+
+def open_inputs(paths):
+	"""Open every input and list its brushes, keeping input order."""
+	files = [zipfile.ZipFile(p) for p in paths]
+	brushes = [brush for zf in files for brush in read_brushes(zf)]
+	return files, brushes
+
+
+def merge(paths, output, set_name=None, uuids=None, names=None, positions=None, on_collision="error"):
+	"""Merge (or subset) the selected brushes of `paths` into one brushset."""
+	output = Path(output)
+	files, brushes = open_inputs(paths)
+	try:
+		picked = select(brushes, uuids, names, positions)
+		if not picked:
+			raise ValueError("No brushes matched the selection")
+		written = write_brushset(picked, output, set_name or output.stem, on_collision)
+	finally:
+		for zf in files:
+			zf.close()
+	print(f"Wrote {len(written)} of {len(brushes)} brushes to {output}")
+	return written
+
+
+def split(path, size, output_dir=None, uuids=None, names=None, positions=None):
+	"""Split one brushset into sets of at most `size` brushes, named '<set> 1', '<set> 2', ..."""
+	path = Path(path)
+	output_dir = Path(output_dir) if output_dir else creator2.setdir
+	outputs = []
+	files, brushes = open_inputs([path])
+	try:
+		picked = select(brushes, uuids, names, positions)
+		set_name = plistlib.loads(files[0].read("brushset.plist")).get("name", path.stem)
+		for part, first in enumerate(range(0, len(picked), size), 1):
+			part_name = f"{set_name} {part}"
+			output = output_dir/f"{part_name}.brushset"
+			write_brushset(picked[first:first + size], output, part_name)
+			outputs.append(output)
+	finally:
+		files[0].close()
+	print(f"Split {len(picked)} brushes from {path} into {len(outputs)} sets in {output_dir}")
+	return outputs
+
+
+def add_selection_arguments(parser):
+	parser.add_argument("--uuid", dest="uuids", action="append", help="keep the brush with this UUID (repeatable)")
+	parser.add_argument("--brush-name", dest="names", action="append", help="keep brushes whose name matches this pattern, e.g. 'Brick*' (repeatable)")
+	parser.add_argument("--index", dest="positions", type=parse_index_spec, help="keep brushes at these 1-based positions across all inputs, e.g. 1,4-6")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Merge, split or subset .brushset files without recompressing them")
+	sub = parser.add_subparsers(dest="command", required=True)
+
+	merge_parser = sub.add_parser("merge", help="combine the selected brushes of one or more inputs into one set")
+	merge_parser.add_argument("inputs", nargs="+", help=".brushset or .brush files")
+	merge_parser.add_argument("-o", "--output", required=True, help="brushset to write")
+	merge_parser.add_argument("--set-name", default=None, help="name stored in brushset.plist (default: output file name)")
+	merge_parser.add_argument("--on-collision", choices=("error", "skip", "reassign"), default="error", help="what to do when two brushes share a UUID")
+	add_selection_arguments(merge_parser)
+
+	split_parser = sub.add_parser("split", help="split one set into several smaller ones")
+	split_parser.add_argument("input", help=".brushset file")
+	split_parser.add_argument("--size", type=int, required=True, help="brushes per output set")
+	split_parser.add_argument("-o", "--output-dir", default=None, help=f"folder for the new sets (default: {creator2.setdir.name})")
+	add_selection_arguments(split_parser)
+	args = parser.parse_args()
+
+	start = time.time()
+	if args.command == "merge":
+		merge(args.inputs, args.output, args.set_name, args.uuids, args.names, args.positions, args.on_collision)
+	else:
+		if args.size < 1:
+			parser.error("--size must be at least 1")
+		split(args.input, args.size, args.output_dir, args.uuids, args.names, args.positions)
+	print(f"Time taken: {time.time()-start:.2f} seconds")
@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+"""
+Spread a brush build over several machines through a shared directory.
+
+The coordinator writes one JSON work item per brush into <queue>/pending.
+Workers on any machine that
+mounts the queue (and sees Samples.tmp at the same path) claim items by
+renaming them into <queue>/claimed; a rename succeeds for exactly one worker,
+so no item is built twice at the same time. While building, a worker touches
+its claimed file every few seconds. Claims whose file hasn't been touched for
+`lease` seconds belong to a dead worker and are moved back to pending, up to
+`max_attempts` times before the item goes to <queue>/failed.
+
+Lease ages are measured on the shared filesystem's clock, never the local
+one: heartbeats set mtimes with utime(None), which NFS stamps with the
+server's time, and `reap` compares them with the mtime of a file it touches
+the same way. Clock skew between nodes therefore can't expire a live lease.
+A worker whose lease did expire may still finish its brush; every
+RawZipWriter writes its own temporary file, so both copies are complete and
+whichever lands last is kept.
+
+Brushes land in <queue>/brushes/<set>/. Once every brush of a set is done (or
+has failed for good) the coordinator assembles the .brushset into
+build_brush_sets.tmp, and when all sets are written it drops a STOP file that
+tells idle workers to exit. Re-running the coordinator on the same queue
+resumes it: items already queued, claimed or done are left as they are.
+
+	python distributed.py coordinator --queue /mnt/shared/queue
+	python distributed.py worker --queue /mnt/shared/queue --processes 8      # on every node
+
+	python distributed.py coordinator --queue queue.tmp --local-workers 4     # everything on one box
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from multiprocessing import Process
+from pathlib import Path
+
+import creator2
+from grain_normalize import GrainNormalizer
+
+STATES = ("pending", "claimed", "done", "failed")
+
+
+class WorkQueue:
+	"""The queue directories and the rename-based moves between them."""
+
+	def __init__(self, root):
+		self.root = Path(root)
+		for state in (*STATES, "tmp", "brushes"):
+			(self.root/state).mkdir(parents=True, exist_ok=True)
+
+	def dir(self, state):
+		return self.root/state
+
+	@property
+	def stop_file(self):
+		return self.root/"STOP"
+
+	def write(self, state, name, item):
+		"""Write `item` as <state>/<name>, atomically."""
+		tmp = self.dir("tmp")/f"{name}.{socket.gethostname()}-{os.getpid()}"
+		tmp.write_text(json.dumps(item))
+		os.replace(tmp, self.dir(state)/name)
+
+	def now(self):
+		"""The shared filesystem's current time, read back from a file touched just now."""
+		# shared by every node: touching it at the same time from several is harmless
+		clock = self.dir("tmp")/"clock"
+		clock.touch()
+		return clock.stat().st_mtime
+
+	def known(self):
+		"""Item names in any state, e.g. to skip re-queueing them."""
+		names = set()
+		for state in STATES:
+			names.update(item_name(p.name) for p in self.dir(state).iterdir())
+		return names
+
+	def claim(self, worker):
+		"""Move one pending item to claimed/<name>.<worker>; return (path, item) or None."""
+		for path in sorted(self.dir("pending").iterdir()):
+			claimed = self.dir("claimed")/f"{path.name}.{worker}"
+			try:
+				# the lease starts now, not when the item was queued: touched before
+				# the rename, so a reap can never see the claim with its queue-time mtime
+				os.utime(path)
+				os.rename(path, claimed)
+			except FileNotFoundError:
+				continue  # another worker got it first
+			return claimed, json.loads(claimed.read_text())
+		return None
+
+	def take(self, claimed):
+		"""Move a claimed file aside so only one process handles it; None if it's gone."""
+		taken = self.dir("tmp")/f"{claimed.name}.taken"
+		try:
+			os.rename(claimed, taken)
+		except FileNotFoundError:
+			return None
+		return taken
+
+	def retry_or_fail(self, taken, item, max_attempts):
+		"""Put a taken item back in pending, or in failed once it's out of attempts."""
+		item["attempts"] = item.get("attempts", 0) + 1
+		state = "failed" if item["attempts"] >= max_attempts else "pending"
+		self.write(state, item_name(taken.name), item)
+		taken.unlink()
+		return state
+
+	def release(self, claimed, item, state, max_attempts=None):
+		"""Finish a claim as done (or retry/fail it); False if the lease was lost meanwhile."""
+		taken = self.take(claimed)
+		if taken is None:
+			return False
+		if state == "done":
+			self.write("done", item_name(taken.name), item)
+			taken.unlink()
+		else:
+			self.retry_or_fail(taken, item, max_attempts)
+		return True
+
+	def reap(self, lease, max_attempts):
+		"""Return claims not heartbeated for `lease` seconds to pending (or failed)."""
+		now = self.now()
+		reaped = 0
+		for claimed in self.dir("claimed").iterdir():
+			try:
+				if now - claimed.stat().st_mtime < lease:
+					continue
+			except FileNotFoundError:
+				continue
+			taken = self.take(claimed)
+			if taken is None:
+				continue  # finished or reaped by someone else meanwhile
+			item = json.loads(taken.read_text())
+			item["error"] = f"lease expired on {claimed.name.rsplit('.', 1)[-1]}"
+			state = self.retry_or_fail(taken, item, max_attempts)
+			print(f"Lease expired for {claimed.name}, moved to {state}")
+			reaped += 1
+		return reaped
+
+	def items(self, state):
+		for path in self.dir(state).iterdir():
+			try:
+				yield json.loads(path.read_text())
+			except (FileNotFoundError, json.JSONDecodeError):
+				continue  # moved or being written
+
+
+def item_name(filename):
+	"""'<set>--<id>.json' from a claimed file name with the worker appended."""
+	return filename[:filename.index(".json") + 5]
+
+
+class Heartbeat(threading.Thread):
+	"""Touch the claimed file while its brush builds, so the lease stays alive."""
+
+	def __init__(self, path, interval):
+		super().__init__(daemon=True)
+		self.path = path
+		self.interval = interval
+		self.stopped = threading.Event()
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			try:
+				os.utime(self.path)
+			except FileNotFoundError:
+				return  # reaped: the lease is gone
+
+	def stop(self):
+		self.stopped.set()
+		self.join()
+
+
+def run_worker(queue_root, lease=60.0, max_attempts=3, poll=1.0):
+	"""Claim and build brushes until the coordinator says STOP and nothing is pending."""
+	queue = WorkQueue(queue_root)
+	worker = f"{socket.gethostname()}-{os.getpid()}"
+	built = 0
+	print(f"Worker {worker} polling {queue.root}")
+	while True:
+		claim = queue.claim(worker)
+		if claim is None:
+			if queue.stop_file.exists():
+				break
+			queue.reap(lease, max_attempts)
+			time.sleep(poll)
+			continue
+
+		claimed, item = claim
+		heartbeat = Heartbeat(claimed, lease / 4)
+		heartbeat.start()
+		start = time.time()
+		try:
+			normalizer = GrainNormalizer(*item["normalization"]) if item.get("normalization") else None
+			creator2.thumbnail_style = item.get("thumbnail_style", creator2.thumbnail_style)
+			brush_dir = queue.dir("brushes")/item["set"]
+			brush_dir.mkdir(exist_ok=True)
+			creator2.generate_individual_brush(Path(item["source"]), item["brush_id"], normalizer, brush_dir)
+		except Exception as e:
+			heartbeat.stop()
+			traceback.print_exception(type(e), e, e.__traceback__)
+			item["error"] = f"{type(e).__name__}: {e}"
+			queue.release(claimed, item, "retry", max_attempts)
+			continue
+		heartbeat.stop()
+
+		item.update(worker=worker, seconds=time.time() - start)
+		if queue.release(claimed, item, "done"):
+			built += 1
+		else:
+			print(f"Lost the lease on {item['set']}/{item['brush_id']}, another worker will redo it")
+	print(f"Worker {worker} finished after building {built} brushes")
+	return built
+
+
+def enqueue(queue, root, normalization=None):
+	"""Queue every source under `root` that isn't already in the queue; return {set: [ids]}."""
+	known = queue.known()
+	sets = {}
+	queued = 0
+	for folder in sorted(root.iterdir()):
+		if not folder.is_dir():
+			continue
+		sources = creator2.find_sources(folder)
+		if not sources:
+			continue
+		sets[folder.name] = [brush_id for brush_id, _ in sources]
+		for brush_id, path in sources:
+			name = f"{folder.name}--{brush_id}.json"
+			if name in known:
+				continue
+			queue.write("pending", name, {
+				"set": folder.name,
+				"brush_id": brush_id,
+				"source": str(path.resolve()),
+				"normalization": normalization,
+				"thumbnail_style": creator2.thumbnail_style,
+				"attempts": 0,
+			})
+			queued += 1
+	print(f"Queued {queued} brushes in {len(sets)} sets ({sum(map(len, sets.values())) - queued} already in the queue)")
+	return sets
+
+
+def coordinate(queue_root, root=creator2.indir, normalization=None, lease=60.0, max_attempts=3, poll=1.0, local_workers=0):
+	"""Queue the build, assemble each set once its brushes are finished, then stop the workers."""
+	start = time.time()
+	queue = WorkQueue(queue_root)
+	queue.stop_file.unlink(missing_ok=True)
+	sets = enqueue(queue, Path(root), normalization)
+
+	workers = [Process(target=run_worker, args=(queue_root, lease, max_attempts, poll)) for _ in range(local_workers)]
+	for process in workers:
+		process.start()
+
+	assembled = set()
+	while len(assembled) < len(sets):
+		queue.reap(lease, max_attempts)
+		done, failed = {}, {}
+		for state, found in (("done", done), ("failed", failed)):
+			for item in queue.items(state):
+				found.setdefault(item["set"], set()).add(item["brush_id"])
+
+		for set_name, brush_ids in sets.items():
+			if set_name in assembled:
+				continue
+			finished = done.get(set_name, set()) | failed.get(set_name, set())
+			if not finished.issuperset(brush_ids):
+				continue
+			ids = [bid for bid in brush_ids if bid in done.get(set_name, set())]
+			if ids:
+				creator2.generate_brush_set(ids, set_name, queue.dir("brushes")/set_name)
+			print(f"Set {set_name}: {len(ids)} brushes, {len(brush_ids) - len(ids)} failed")
+			assembled.add(set_name)
+		if len(assembled) < len(sets):
+			time.sleep(poll)
+
+	queue.stop_file.touch()
+	for process in workers:
+		process.join()
+
+	per_worker = {}
+	for item in queue.items("done"):
+		per_worker.setdefault(item.get("worker"), []).append(item.get("seconds", 0))
+	print("\nworker                          brushes   build s")
+	for worker, seconds in sorted(per_worker.items(), key=lambda kv: str(kv[0])):
+		print(f"{str(worker):<32} {len(seconds):>6} {sum(seconds):>9.1f}")
+	for item in queue.items("failed"):
+		print(f"Failed: {item['set']}/{item['brush_id']} after {item['attempts']} attempts: {item.get('error')}")
+	print(f"Distributed build finished in {time.time() - start:.2f} seconds")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Distribute brush builds over machines sharing a directory")
+	sub = parser.add_subparsers(dest="command", required=True)
+	for name in ("coordinator", "worker"):
+		command_parser = sub.add_parser(name)
+		command_parser.add_argument("--queue", type=Path, required=True, help="shared queue directory")
+		command_parser.add_argument("--lease", type=float, default=60.0, help="seconds without a heartbeat before a claim is retried elsewhere")
+		command_parser.add_argument("--max-attempts", type=int, default=3)
+		command_parser.add_argument("--poll", type=float, default=1.0)
+	coordinator_parser = sub.choices["coordinator"]
+	coordinator_parser.add_argument("--root", type=Path, default=creator2.indir, help="sample folders, one per set (must be visible to workers at the same path)")
+	coordinator_parser.add_argument("--local-workers", type=int, default=0, help="also run this many workers on this machine")
+	coordinator_parser.add_argument("--grain-max-edge", type=int, default=None)
+	coordinator_parser.add_argument("--grain-power-of-two", action="store_true")
+	coordinator_parser.add_argument("--no-seamless", dest="seamless", action="store_false")
+	coordinator_parser.add_argument("--thumbnail-style", choices=("grain", "stroke"), default=creator2.thumbnail_style)
+	sub.choices["worker"].add_argument("--processes", type=int, default=os.cpu_count(), help="worker processes on this machine")
+	args = parser.parse_args()
+
+	if args.command == "coordinator":
+		normalization = None
+		if args.grain_max_edge or args.grain_power_of_two:
+			normalization = [args.grain_max_edge, args.grain_power_of_two, args.seamless]
+		creator2.thumbnail_style = args.thumbnail_style
+		coordinate(args.queue, args.root, normalization, args.lease, args.max_attempts, args.poll, args.local_workers)
+	else:
+		processes = [Process(target=run_worker, args=(args.queue, args.lease, args.max_attempts, args.poll)) for _ in range(args.processes)]
+		for process in processes:
+			process.start()
+		for process in processes:
+			process.join()
@@ -0,0 +1,127 @@
+"""
+Grain size normalization.
+
+Procreate grains far beyond a couple of thousand pixels only bloat the
+.brushset and slow import on device, so grains can be capped at a maximum edge
+and optionally snapped to power-of-two squares. Grains tile, so resampling
+wraps around the edges instead of clamping, which keeps the seams invisible
+after downscaling.
+"""
+
+import math
+import threading
+
+import numpy as np
+from PIL import Image
+
+# output pixels of wrapped context kept around the grain while resampling,
+# enough for the LANCZOS support (3 px)
+SEAM_MARGIN = 4
+
+
+def power_of_two_floor(n):
+	"""Largest power of two <= n."""
+	return 1 << (max(int(n), 1).bit_length() - 1)
+
+
+def normalized_size(size, max_edge=None, power_of_two=False):
+	"""Return the grain size after applying the edge cap and power-of-two snapping."""
+	width, height = size
+	if power_of_two:
+		edge = max(width, height)
+		if max_edge:
+			edge = min(edge, max_edge)
+		edge = power_of_two_floor(edge)
+		return (edge, edge)
+
+	if max_edge and max(width, height) > max_edge:
+		scale = max_edge / max(width, height)
+		return (max(1, round(width * scale)), max(1, round(height * scale)))
+	return (width, height)
+
+
+def tile_resize(img, size, resample=Image.LANCZOS):
+	"""Resize a tileable image, sampling across its edges as if it were wrapped."""
+	width, height = img.size
+	scale = max(width / size[0], height / size[1])
+	pad = math.ceil(SEAM_MARGIN * max(scale, 1)) + 1
+	pad_x, pad_y = min(pad, width), min(pad, height)
+
+	arr = np.asarray(img)
+	wrap = ((pad_y, pad_y), (pad_x, pad_x)) + ((0, 0),) * (arr.ndim - 2)
+	padded = Image.fromarray(np.pad(arr, wrap, mode="wrap"), img.mode)
+	return padded.resize(size, resample, box=(pad_x, pad_y, pad_x + width, pad_y + height))
+
+
+class GrainNormalizer:
+	"""
+	Normalization settings for one brush set, plus the bytes saved by them.
+
+	Savings are counted as decoded L grain bytes (one byte per pixel) at the
+	source size against the normalized size: that's the memory a grain takes
+	on device, and what the Grain.png size follows. The encoded Grain.png
+	bytes that actually ship are tallied alongside (see `add_encoded`).
+	Comparing them with the source files instead would measure the change of
+	format (JPEG or PNG on disk versus a re-encoded PNG), not normalization.
+	Called from the worker threads, so the tallies are guarded by a lock.
+	"""
+
+	def __init__(self, max_edge=None, power_of_two=False, seamless=True):
+		self.max_edge = max_edge
+		self.power_of_two = power_of_two
+		self.seamless = seamless
+		self.brushes = 0
+		self.resized = 0
+		self.stretched = 0
+		self.source_bytes = 0
+		self.grain_bytes = 0
+		self.png_bytes = 0
+		self._lock = threading.Lock()
+
+	@property
+	def active(self):
+		return bool(self.max_edge or self.power_of_two)
+
+	def __call__(self, img, source_size=None):
+		"""
+		Normalize an L grain.
+
+		`source_size` is the size of the original image when it was already
+		decoded at reduced resolution, so the report counts the real savings.
+		"""
+		source_size = source_size or img.size
+		size = normalized_size(source_size, self.max_edge, self.power_of_two)
+		# stretched rather than cropped: a crop would cut the tile and break its seams
+		stretched = self.power_of_two and source_size[0] != source_size[1]
+		if stretched:
+			print(f"Warning: stretching {source_size[0]}x{source_size[1]} grain to a {size[0]}x{size[1]} power-of-two square")
+		if size != img.size:
+			img = tile_resize(img, size) if self.seamless else img.resize(size, Image.LANCZOS)
+
+		with self._lock:
+			self.brushes += 1
+			self.resized += size != tuple(source_size)
+			self.stretched += stretched
+			self.source_bytes += source_size[0] * source_size[1]
+			self.grain_bytes += size[0] * size[1]
+		return img
+
+	def add_encoded(self, png_bytes):
+		"""Count the size of an encoded Grain.png as shipped in the .brush."""
+		with self._lock:
+			self.png_bytes += png_bytes
+
+	def report(self, set_name):
+		"""Summarize decoded grain bytes before and after normalization for the set."""
+		saved = self.source_bytes - self.grain_bytes
+		return {
+			"set": set_name,
+			"brushes": self.brushes,
+			"resized": self.resized,
+			"stretched": self.stretched,
+			"source_bytes": self.source_bytes,
+			"grain_bytes": self.grain_bytes,
+			"png_bytes": self.png_bytes,
+			"saved_bytes": saved,
+			"saved_percent": 100 * saved / self.source_bytes if self.source_bytes else 0.0,
+		}
@@ -0,0 +1,153 @@
+"""
+Per-stage timing and memory instrumentation.
+
+Wrap a pipeline step in `with instrument.stage("grain", brush=bid):` to record
+its wall time, CPU time of the running thread and the process peak RSS when it
+finished. Records are written as JSON lines as they happen, or aggregated into
+a summary table printed by `report()`.
+
+Instrumentation is off until `configure()` is called with a mode; while off,
+`stage()` hands back a shared no-op context manager, so leaving the calls in
+hot paths costs a function call and an attribute check.
+
+Shared by creator2 and BrushSet-Video/app.py.
+"""
+
+import json
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+try:
+	import resource
+except ImportError:  # Windows
+	resource = None
+
+MODES = ("jsonl", "table")
+
+mode = None
+_out = None
+_lock = threading.Lock()
+_totals = {}
+_null = nullcontext()
+
+
+def configure(new_mode=None, path=None):
+	"""Turn instrumentation on ("jsonl" or "table") or off (None)."""
+	global mode, _out
+	if new_mode not in (None,) + MODES:
+		raise ValueError(f"Unknown metrics mode {new_mode!r}, choose from {MODES}")
+	if _out not in (None, sys.stdout):
+		_out.close()
+	mode = new_mode
+	_out = None
+	if mode == "jsonl":
+		_out = open(path, "a", encoding="utf-8") if path else sys.stdout
+	_totals.clear()
+
+
+def peak_rss_mb():
+	"""Peak resident set size of this process so far, in MiB."""
+	if resource is None:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# kilobytes on Linux, bytes on macOS
+	return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def record(name, wall, cpu, count=1, **labels):
+	"""Store one finished measurement."""
+	rss = peak_rss_mb()
+	with _lock:
+		if mode == "jsonl":
+			entry = {"stage": name, "wall": round(wall, 6), "cpu": round(cpu, 6), "peak_rss_mb": rss and round(rss, 1)}
+			if count != 1:
+				entry["count"] = count
+			entry.update(labels)
+			_out.write(json.dumps(entry) + "\n")
+			_out.flush()
+		else:
+			total = _totals.setdefault(name, [0, 0.0, 0.0, 0.0])
+			total[0] += count
+			total[1] += wall
+			total[2] += cpu
+			total[3] = max(total[3], rss or 0.0)
+
+
+class _Stage:
+	__slots__ = ("name", "labels", "wall", "cpu")
+
+	def __init__(self, name, labels):
+		self.name = name
+		self.labels = labels
+
+	def __enter__(self):
+		self.wall = time.perf_counter()
+		self.cpu = time.thread_time()
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		labels = self.labels
+		if exc_type is not None:
+			labels = dict(labels, error=exc_type.__name__)
+		record(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu, **labels)
+
+
+def stage(name, **labels):
+	"""Context manager measuring one stage; a no-op while instrumentation is off."""
+	if mode is None:
+		return _null
+	return _Stage(name, labels)
+
+
+class Tally:
+	"""
+	Accumulate many short calls into a single record.
+
+	For per-frame callbacks and the like, where one record per call would be
+	noise. `wrap()` returns the function untouched while instrumentation is off.
+	"""
+
+	def __init__(self, name):
+		self.name = name
+		self.count = 0
+		self.wall = 0.0
+		self.cpu = 0.0
+		self._lock = threading.Lock()
+
+	def wrap(self, fn):
+		if mode is None:
+			return fn
+
+		def timed(*args, **kwargs):
+			wall, cpu = time.perf_counter(), time.thread_time()
+			try:
+				return fn(*args, **kwargs)
+			finally:
+				wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+				with self._lock:
+					self.count += 1
+					self.wall += wall
+					self.cpu += cpu
+		return timed
+
+	def emit(self, **labels):
+		if mode is not None and self.count:
+			record(self.name, self.wall, self.cpu, count=self.count, **labels)
+
+
+def report(file=None):
+	"""Print the aggregated summary table (table mode only)."""
+	if mode != "table" or not _totals:
+		return
+	file = file or sys.stdout
+	print(f"\n{'stage':<20} {'count':>7} {'wall s':>10} {'mean ms':>10} {'cpu s':>10} {'peak rss MiB':>13}", file=file)
+	for name, (count, wall, cpu, rss) in _totals.items():
+		print(f"{name:<20} {count:>7} {wall:>10.3f} {1000 * wall / count:>10.2f} {cpu:>10.3f} {rss:>13.1f}", file=file)
+
+
+def add_arguments(parser):
+	"""Add the --metrics/--metrics-file flags to an argparse parser."""
+	parser.add_argument("--metrics", choices=MODES, default=None, help="record per-stage wall time, CPU time and peak RSS")
+	parser.add_argument("--metrics-file", default=None, help="append JSON lines here instead of stdout")
@@ -0,0 +1,134 @@
+"""
+Memory-aware admission for brush generation.
+
+Large scanned textures (12k x 12k and up) are fully decoded, converted to L and
+resized while a brush is built. Running several of those at once on the worker
+pool is what runs the box out of memory, so every task reserves its estimated
+decoded footprint against a shared budget before it starts.
+
+The estimate comes from the image header only (`Image.open` is lazy), and
+accounts for JPEG draft decoding when the grain is going to be downscaled.
+"""
+
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from PIL import Image
+
+# bytes per pixel for the decoded modes we see in Samples.tmp
+MODE_BYTES = {
+	"1": 1, "L": 1, "P": 1, "LA": 2, "PA": 2, "La": 2,
+	"I;16": 2, "I;16B": 2, "I;16L": 2,
+	"RGB": 4, "RGBA": 4, "RGBa": 4, "RGBX": 4, "CMYK": 4, "YCbCr": 4, "LAB": 4, "HSV": 4,
+	"I": 4, "F": 4,
+}
+
+
+def draft_scale(size, max_edge):
+	"""Return the JPEG draft scale (1, 2, 4 or 8) that still covers `max_edge`."""
+	if not max_edge:
+		return 1
+	scale = 1
+	while scale < 8 and max(size) // (scale * 2) >= max_edge:
+		scale *= 2
+	return scale
+
+
+def estimate_decoded_bytes(img_path, max_edge=None):
+	"""
+	Estimate peak bytes needed to build a grain from `img_path`.
+
+	Covers the decoded source plus the L copy made from it; the thumbnail is
+	small enough to ignore. Returns 0 if the header can't be read, letting the
+	task fail with a proper error once it runs.
+	"""
+	try:
+		with Image.open(img_path) as img:
+			size, mode, fmt = img.size, img.mode, img.format
+	except Exception:
+		return 0
+
+	if fmt == "JPEG":
+		scale = draft_scale(size, max_edge)
+		size = (size[0] // scale, size[1] // scale)
+
+	pixels = size[0] * size[1]
+	return pixels * (MODE_BYTES.get(mode, 4) + 1)
+
+
+def open_grain_source(img_path, max_edge=None):
+	"""
+	Open a grain source as L, decoding at reduced resolution when possible.
+
+	With `max_edge` set, JPEGs are drafted straight to the smallest DCT scale
+	covering it and other formats are box-reduced by an integer factor before
+	the final resample, so the big LANCZOS pass never runs on the full image.
+	Without it the image is returned at its original size.
+
+	Returns the image together with the size of the source on disk.
+	"""
+	img = Image.open(img_path)
+	source_size = img.size
+	if not max_edge or max(img.size) <= max_edge:
+		return img.convert("L"), source_size
+
+	if img.format == "JPEG":
+		scale = draft_scale(img.size, max_edge)
+		img.draft("L", (img.size[0] // scale, img.size[1] // scale))
+	img = img.convert("L")
+
+	# keep at least 2x the target before the quality resample
+	factor = max(img.size) // (max_edge * 2)
+	if factor > 1:
+		img = img.reduce(factor)
+	return img, source_size
+
+
+class MemoryBudget:
+	"""
+	Counting semaphore over bytes.
+
+	A task whose estimate exceeds the whole budget is still admitted, but only
+	when nothing else is running, so oversized sources run alone instead of
+	deadlocking the pool.
+	"""
+
+	def __init__(self, limit_bytes):
+		self.limit = int(limit_bytes)
+		self.in_use = 0
+		self.peak = 0
+		self._cond = threading.Condition()
+
+	def _fits(self, nbytes):
+		return self.in_use == 0 or self.in_use + nbytes <= self.limit
+
+	def acquire(self, nbytes, label=None):
+		"""Block until `nbytes` fit in the budget and take them."""
+		nbytes = int(nbytes)
+		with self._cond:
+			if not self._fits(nbytes):
+				print(f"Waiting for memory budget for {label or 'task'} ({nbytes / 2**20:.0f} MiB, {self.in_use / 2**20:.0f} MiB in use)")
+			self._cond.wait_for(lambda: self._fits(nbytes))
+			self.in_use += nbytes
+			self.peak = max(self.peak, self.in_use)
+
+	def release(self, nbytes):
+		"""Give back bytes taken with `acquire`."""
+		with self._cond:
+			self.in_use -= int(nbytes)
+			self._cond.notify_all()
+
+	@contextmanager
+	def reserve(self, nbytes, label=None):
+		"""Block until `nbytes` fit in the budget, hold them for the `with` body."""
+		self.acquire(nbytes, label)
+		try:
+			yield
+		finally:
+			self.release(nbytes)
+
+
+def plan_tasks(sources, max_edge=None):
+	"""Attach a decoded-size estimate to each (brush_id, path) pair."""
+	return [(bid, Path(path), estimate_decoded_bytes(path, max_edge)) for bid, path in sources]
@@ -0,0 +1,173 @@
+"""
+Bounded-queue stage pipeline.
+
+Each stage runs its function on its own pool of threads and hands results to
+the next stage through a bounded queue, so decode, compute and disk work of
+different items overlap and a slow stage pushes back on the ones before it
+instead of letting decoded images pile up in memory. Throughput ends up limited
+by the slowest stage rather than the sum of all of them.
+
+PIL, NumPy and zlib release the GIL for the heavy parts, which is what makes
+threads enough here.
+
+	stages = [Stage("decode", decode, workers=2), Stage("encode", encode, workers=4)]
+	results = Pipeline(stages).run(items)
+"""
+
+import queue
+import threading
+import time
+import traceback
+
+_DONE = object()
+
+
+class Stage:
+	"""One step of the pipeline: `fn(item) -> item`, run by `workers` threads."""
+
+	def __init__(self, name, fn, workers=1, maxsize=4):
+		self.name = name
+		self.fn = fn
+		self.workers = workers
+		self.maxsize = maxsize
+		self.busy = 0.0
+		self.items = 0
+		self.errors = 0
+		self.depth_total = 0
+		self.depth_max = 0
+
+
+class Pipeline:
+	"""
+	Run items through a list of `Stage`s.
+
+	`on_exit(item, error)` is called once per item when it leaves the
+	pipeline, after the last stage or after the stage that raised, which is
+	where per-item resources (like a memory reservation) are released. An
+	error raised by `on_exit` itself is printed and doesn't stop the worker.
+	If `items` raises, the items already fed still finish, then `run` raises.
+	"""
+
+	def __init__(self, stages, on_exit=None, monitor_interval=0.1):
+		self.stages = stages
+		self.on_exit = on_exit
+		self.monitor_interval = monitor_interval
+		self.queues = [queue.Queue(maxsize=stage.maxsize) for stage in stages]
+		self.samples = 0
+		self.wall = 0.0
+		self._lock = threading.Lock()
+		self._results = []
+		self._running = [stage.workers for stage in stages]
+
+	def _exit(self, item, error):
+		if not self.on_exit:
+			return
+		try:
+			self.on_exit(item, error)
+		except Exception as e:
+			print("Pipeline on_exit failed")
+			traceback.print_exception(type(e), e, e.__traceback__)
+
+	def _worker(self, index):
+		stage = self.stages[index]
+		inbox = self.queues[index]
+		outbox = self.queues[index + 1] if index + 1 < len(self.stages) else None
+		try:
+			while True:
+				item = inbox.get()
+				if item is _DONE:
+					break
+				start = time.perf_counter()
+				try:
+					item = stage.fn(item)
+				except Exception as e:
+					with self._lock:
+						stage.busy += time.perf_counter() - start
+						stage.errors += 1
+					print(f"Stage {stage.name} failed")
+					traceback.print_exception(type(e), e, e.__traceback__)
+					self._exit(item, e)
+					continue
+				with self._lock:
+					stage.busy += time.perf_counter() - start
+					stage.items += 1
+				if outbox is not None:
+					# blocks while the next stage is behind: this is the back-pressure
+					outbox.put(item)
+				else:
+					with self._lock:
+						self._results.append(item)
+					self._exit(item, None)
+		finally:
+			# the last worker of a stage to finish tells every worker of the next one
+			with self._lock:
+				self._running[index] -= 1
+				last = self._running[index] == 0
+			if last and outbox is not None:
+				for _ in range(self.stages[index + 1].workers):
+					outbox.put(_DONE)
+
+	def _monitor(self, stop):
+		while not stop.wait(self.monitor_interval):
+			self.samples += 1
+			for stage, q in zip(self.stages, self.queues):
+				depth = q.qsize()
+				stage.depth_total += depth
+				stage.depth_max = max(stage.depth_max, depth)
+
+	def run(self, items):
+		"""Feed `items` through every stage and return the finished items."""
+		start = time.perf_counter()
+		threads = [
+			threading.Thread(target=self._worker, args=(i,), name=f"{stage.name}-{n}", daemon=True)
+			for i, stage in enumerate(self.stages)
+			for n in range(stage.workers)
+		]
+		stop = threading.Event()
+		monitor = threading.Thread(target=self._monitor, args=(stop,), daemon=True)
+		for thread in threads:
+			thread.start()
+		monitor.start()
+
+		try:
+			for item in items:
+				self.queues[0].put(item)
+		finally:
+			# also when `items` raised, so the workers drain and exit before it propagates
+			for _ in range(self.stages[0].workers):
+				self.queues[0].put(_DONE)
+			for thread in threads:
+				thread.join()
+			stop.set()
+			monitor.join()
+			self.wall = time.perf_counter() - start
+		return self._results
+
+	def stats(self):
+		"""Per-stage items, errors, utilisation and input queue depth."""
+		rows = []
+		for stage in self.stages:
+			capacity = self.wall * stage.workers
+			rows.append({
+				"stage": stage.name,
+				"workers": stage.workers,
+				"items": stage.items,
+				"errors": stage.errors,
+				"busy": stage.busy,
+				"utilisation": stage.busy / capacity if capacity else 0.0,
+				"queue_mean": stage.depth_total / self.samples if self.samples else 0.0,
+				"queue_max": stage.depth_max,
+				"queue_size": stage.maxsize,
+			})
+		return rows
+
+	def report(self):
+		"""Print the stage table; the busiest stage is the bottleneck."""
+		rows = self.stats()
+		bottleneck = max(rows, key=lambda r: r["utilisation"])["stage"] if rows else None
+		print(f"\n{'stage':<12} {'workers':>7} {'items':>6} {'errors':>6} {'busy s':>8} {'util':>6} {'queue avg/max/size':>20}")
+		for r in rows:
+			mark = "  <- bottleneck" if r["stage"] == bottleneck else ""
+			queue_text = f"{r['queue_mean']:.1f}/{r['queue_max']}/{r['queue_size']}"
+			print(f"{r['stage']:<12} {r['workers']:>7} {r['items']:>6} {r['errors']:>6} {r['busy']:>8.2f} {r['utilisation']:>6.0%} {queue_text:>20}{mark}")
+		print(f"Pipeline wall time: {self.wall:.2f}s")
@@ -0,0 +1,263 @@
+"""
+Zip reading and writing at the level of compressed member bytes.
+
+`.brush` and `.brushset` files are plain zip archives. `zipfile` can only
+write members it compresses itself, so packaging brushes into a set used to
+mean extracting every brush and deflating it all again. This module writes the
+zip structures directly, which lets members be copied between archives as raw
+compressed bytes and lets identical members share one compressed payload
+through `DeflateCache`.
+
+Only classic (non-zip64) archives are written: 65535 members and 4 GiB, far
+beyond any brushset Procreate will import.
+"""
+
+import hashlib
+import os
+import socket
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_RECORD = struct.Struct("<IHHHHIIH")
+
+LOCAL_SIG = 0x04034B50
+CENTRAL_SIG = 0x02014B50
+END_SIG = 0x06054B50
+
+VERSION = 20
+MADE_BY = (3 << 8) | VERSION  # unix, so the permission bits below are honoured
+UTF8_FLAG = 0x800
+FILE_ATTR = (0o100644 << 16)
+DIR_ATTR = (0o040755 << 16) | 0x10
+ZIP32_LIMIT = 0xFFFFFFFF
+BRUSH_SUFFIXES = (".brush", ".brushset")
+
+
+class RawMember:
+	"""One zip member as stored: compressed payload plus the metadata to re-emit it."""
+
+	__slots__ = ("name", "compress_type", "crc", "compress_size", "file_size", "date_time", "data")
+
+	def __init__(self, name, compress_type, crc, file_size, data, date_time=None):
+		self.name = name
+		self.compress_type = compress_type
+		self.crc = crc
+		self.compress_size = len(data)
+		self.file_size = file_size
+		self.date_time = date_time or time.localtime()[:6]
+		self.data = data
+
+	@property
+	def is_dir(self):
+		return self.name.endswith("/")
+
+	def decompress(self):
+		"""Return the uncompressed member bytes."""
+		if self.compress_type == zipfile.ZIP_STORED:
+			return self.data
+		if self.compress_type == zipfile.ZIP_DEFLATED:
+			return zlib.decompress(self.data, -15)
+		raise NotImplementedError(f"Unsupported compression {self.compress_type} for {self.name}")
+
+
+def find_brush_files(paths):
+	"""Expand directories into the .brush and .brushset files under them."""
+	for path in map(Path, paths):
+		if path.is_dir():
+			yield from sorted(p for p in path.rglob("*") if p.suffix in BRUSH_SUFFIXES)
+		else:
+			yield path
+
+
+def read_raw(zf, info):
+	"""Read the compressed bytes of `info` from an open `zipfile.ZipFile`."""
+	fp = zf.fp
+	fp.seek(info.header_offset)
+	header = fp.read(LOCAL_HEADER.size)
+	fields = LOCAL_HEADER.unpack(header)
+	if fields[0] != LOCAL_SIG:
+		raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+	name_len, extra_len = fields[9], fields[10]
+	fp.seek(info.header_offset + LOCAL_HEADER.size + name_len + extra_len)
+	data = fp.read(info.compress_size)
+	return RawMember(info.filename, info.compress_type, info.CRC, info.file_size, data, info.date_time)
+
+
+def iter_raw_members(archive):
+	"""Yield every member of a zip file (path or open `ZipFile`) as a `RawMember`."""
+	if isinstance(archive, zipfile.ZipFile):
+		for info in archive.infolist():
+			yield read_raw(archive, info)
+		return
+	with zipfile.ZipFile(archive) as zf:
+		for info in zf.infolist():
+			yield read_raw(zf, info)
+
+
+def deflate(data, level=zlib.Z_DEFAULT_COMPRESSION):
+	"""Compress `data` for a zip member, storing it when deflate doesn't help."""
+	compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+	compressed = compressor.compress(data) + compressor.flush()
+	if len(compressed) >= len(data):
+		return zipfile.ZIP_STORED, data
+	return zipfile.ZIP_DEFLATED, compressed
+
+
+class DeflateCache:
+	"""
+	Content-addressed cache of compressed member payloads.
+
+	Members are keyed by the SHA-256 of their bytes, so identical grains,
+	thumbnails and signature pictures are compressed once and their compressed
+	bytes are reused for every brush and set that carries them. Entries are
+	evicted least-recently-used beyond `max_bytes` of compressed data.
+	"""
+
+	def __init__(self, max_bytes=256 * 1024**2, level=zlib.Z_DEFAULT_COMPRESSION):
+		self.max_bytes = max_bytes
+		self.level = level
+		self.size = 0
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.bytes_reused = 0
+		self.cpu_saved = 0.0
+		self.cpu_hashing = 0.0
+
+	def compress(self, data):
+		"""Return (compress_type, crc, compressed) for `data`, from cache when possible."""
+		start = time.thread_time()
+		key = hashlib.sha256(data).digest()
+		hashed = time.thread_time()
+
+		with self._lock:
+			self.cpu_hashing += hashed - start
+			entry = self._entries.get(key)
+			if entry is not None:
+				self._entries.move_to_end(key)
+				self.hits += 1
+				self.bytes_reused += len(entry[2])
+				self.cpu_saved += entry[3]
+				return entry[:3]
+
+		crc = zlib.crc32(data)
+		compress_type, compressed = deflate(data, self.level)
+		entry = (compress_type, crc, compressed, time.thread_time() - hashed)
+
+		with self._lock:
+			self.misses += 1
+			if key not in self._entries and len(compressed) <= self.max_bytes:
+				self._entries[key] = entry
+				self.size += len(compressed)
+				while self.size > self.max_bytes:
+					_, evicted = self._entries.popitem(last=False)
+					self.size -= len(evicted[2])
+		return entry[:3]
+
+	def report(self):
+		"""Summarize what the cache saved so far."""
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"bytes_reused": self.bytes_reused,
+			"cpu_saved": self.cpu_saved,
+			"cpu_hashing": self.cpu_hashing,
+		}
+
+
+def dos_datetime(date_time):
+	year, month, day, hour, minute, second = date_time
+	year = max(year, 1980)
+	return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+class RawZipWriter:
+	"""
+	Minimal zip writer that accepts already-compressed members.
+
+	Writes to `<path>.<host>-<pid>-<thread>.part` and moves it into place on
+	`close()`, so readers never see a half-written archive. The temporary name
+	is unique per writer, so two writers of the same path (say a worker whose
+	lease expired and the one retrying its brush) each finish a complete file
+	instead of interleaving into one; the last to close wins.
+	"""
+
+	def __init__(self, path, cache=None):
+		self.path = Path(path)
+		self.tmp_path = self.path.with_name(f"{self.path.name}.{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}.part")
+		self.cache = cache
+		self._fp = open(self.tmp_path, "wb")
+		self._central = []
+		self._names = set()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		if exc_type is None:
+			self.close()
+		else:
+			self._fp.close()
+			self.tmp_path.unlink(missing_ok=True)
+
+	def __contains__(self, name):
+		return name in self._names
+
+	def write_raw(self, member, name=None):
+		"""Append a `RawMember`, optionally under a different name."""
+		name = name or member.name
+		if name in self._names:
+			raise ValueError(f"Duplicate zip member {name}")
+		offset = self._fp.tell()
+		if offset > ZIP32_LIMIT or len(self._central) >= 0xFFFF:
+			raise ValueError(f"{self.path} would need zip64, which isn't supported")
+
+		encoded = name.encode("utf-8")
+		flags = 0 if encoded.isascii() else UTF8_FLAG
+		dos_time, dos_date = dos_datetime(member.date_time)
+		self._fp.write(LOCAL_HEADER.pack(
+			LOCAL_SIG, VERSION, flags, member.compress_type, dos_time, dos_date,
+			member.crc, member.compress_size, member.file_size, len(encoded), 0))
+		self._fp.write(encoded)
+		self._fp.write(member.data)
+
+		attr = DIR_ATTR if name.endswith("/") else FILE_ATTR
+		self._central.append(CENTRAL_HEADER.pack(
+			CENTRAL_SIG, MADE_BY, VERSION, flags, member.compress_type, dos_time, dos_date,
+			member.crc, member.compress_size, member.file_size, len(encoded), 0, 0, 0, 0, attr, offset) + encoded)
+		self._names.add(name)
+
+	def write_dir(self, name):
+		"""Add a directory entry (`name` ending in '/') unless it's already there."""
+		if name not in self._names:
+			self.write_raw(RawMember(name, zipfile.ZIP_STORED, 0, 0, b""))
+
+	def write_bytes(self, name, data):
+		"""Compress and append `data`, through the cache when one is attached."""
+		if self.cache is not None:
+			compress_type, crc, compressed = self.cache.compress(data)
+		else:
+			compress_type, compressed = deflate(data)
+			crc = zlib.crc32(data)
+		self.write_raw(RawMember(name, compress_type, crc, len(data), compressed))
+
+	def close(self):
+		if self._fp.closed:
+			return
+		start = self._fp.tell()
+		for record in self._central:
+			self._fp.write(record)
+		size = self._fp.tell() - start
+		if start > ZIP32_LIMIT or size > ZIP32_LIMIT:
+			raise ValueError(f"{self.path} would need zip64, which isn't supported")
+		self._fp.write(END_RECORD.pack(END_SIG, 0, 0, len(self._central), len(self._central), size, start, 0))
+		self._fp.close()
+		os.replace(self.tmp_path, self.path)
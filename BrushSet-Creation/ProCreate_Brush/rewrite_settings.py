@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Bulk-edit brush settings inside existing .brush and .brushset files.
+
+The Brush.archive in every brush is an NSKeyedArchiver plist, and its settings
+can be "modified in tandem" (see creator.py) without rebuilding any brush from
+its source image. This opens each archive, edits the chosen keys on the
+archived SilicaBrush object and writes a new zip in which every other member
+(grains, thumbnails, signatures, brushset.plist) is copied as its raw
+compressed bytes.
+
+	python rewrite_settings.py build_brush_sets.tmp --set plotSpacing=0.12 --set textureMovement=0
+"""
+
+import argparse
+import plistlib
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from rawzip import RawZipWriter, find_brush_files, iter_raw_members
+
+
+def parse_assignment(text):
+	"""Split 'key=value' from the command line."""
+	key, sep, value = text.partition("=")
+	if not sep or not key:
+		raise argparse.ArgumentTypeError(f"Expected key=value, got {text!r}")
+	return key.strip(), value.strip()
+
+
+def coerce(value, current):
+	"""Convert a command-line string to the type the archive already stores."""
+	if isinstance(current, bool):
+		lowered = value.lower()
+		if lowered not in ("true", "false", "1", "0", "yes", "no"):
+			raise ValueError(f"Expected a boolean, got {value!r}")
+		return lowered in ("true", "1", "yes")
+	if isinstance(current, int):
+		return int(value)
+	if isinstance(current, float):
+		return float(value)
+	return value
+
+
+def uid_index(ref):
+	"""Object index of an NSKeyedArchiver reference (binary UID or XML CF$UID dict)."""
+	if isinstance(ref, plistlib.UID):
+		return ref.data
+	if isinstance(ref, dict) and "CF$UID" in ref:
+		return ref["CF$UID"]
+	return None
+
+
+def rewrite_archive(data, changes):
+	"""Return Brush.archive bytes with `changes` ({key: str value}) applied to the root object."""
+	fmt = plistlib.FMT_BINARY if data.startswith(b"bplist") else plistlib.FMT_XML
+	archive = plistlib.loads(data)
+	objects = archive["$objects"]
+	root = objects[uid_index(archive["$top"]["root"])]
+
+	for key, value in changes.items():
+		if key not in root:
+			raise KeyError(f"Brush.archive has no setting {key!r}")
+		current = root[key]
+		index = uid_index(current)
+		if index is None:
+			root[key] = coerce(value, current)
+		elif isinstance(objects[index], str):
+			# strings like `name` live in $objects and may be shared, so add a new one
+			objects.append(value)
+			new_index = len(objects) - 1
+			root[key] = plistlib.UID(new_index) if fmt == plistlib.FMT_BINARY else {"CF$UID": new_index}
+		else:
+			raise TypeError(f"Setting {key!r} is an archived object, only scalars and strings can be edited")
+
+	return plistlib.dumps(archive, fmt=fmt, sort_keys=False)
+
+
+def rewrite_file(source, destination, changes):
+	"""Rewrite every Brush.archive in one .brush/.brushset, copying the rest raw."""
+	archives = 0
+	with RawZipWriter(destination) as zw:
+		with zipfile.ZipFile(source) as zf:
+			for member in iter_raw_members(zf):
+				if member.name.rsplit("/", 1)[-1] == "Brush.archive":
+					zw.write_bytes(member.name, rewrite_archive(member.decompress(), changes))
+					archives += 1
+				else:
+					zw.write_raw(member)
+	return str(source), archives
+
+
+def _rewrite_task(args):
+	return rewrite_file(*args)
+
+
+def rewrite_all(paths, changes, output_dir=None, workers=None):
+	"""
+	Rewrite settings in every brush file under `paths`.
+
+	Files are rewritten in place unless `output_dir` is given, in which case
+	they keep their names there. Returns the number of archives changed.
+	"""
+	tasks = []
+	for source in find_brush_files(paths):
+		destination = Path(output_dir)/source.name if output_dir else source
+		tasks.append((source, destination, changes))
+	if output_dir:
+		Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+	total = 0
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		for source, archives in executor.map(_rewrite_task, tasks, chunksize=8):
+			print(f"Rewrote {archives} brush settings in {source}")
+			total += archives
+	return len(tasks), total
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Edit Brush.archive settings in existing .brush/.brushset files")
+	parser.add_argument("paths", nargs="+", help=".brush/.brushset files or folders containing them")
+	parser.add_argument("--set", dest="changes", action="append", type=parse_assignment, required=True, metavar="KEY=VALUE", help="setting to change, e.g. plotSpacing=0.1 (repeatable)")
+	parser.add_argument("--output-dir", default=None, help="write rewritten files here instead of in place")
+	parser.add_argument("--workers", type=int, default=None)
+	args = parser.parse_args()
+
+	start = time.time()
+	files, archives = rewrite_all(args.paths, dict(args.changes), args.output_dir, args.workers)
+	print(f"Rewrote {archives} brushes in {files} files")
+	print(f"Time taken: {time.time()-start:.2f} seconds")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+Stroke previews for QuickLook thumbnails.
+
+Instead of showing the grain itself, this stamps a round brush tip along an
+S-shaped stroke across the 1060x324 thumbnail, the way Procreate draws its
+library previews, with the grain as the canvas texture. Stamp spacing, preview
+size, tapers, opacity and texture scale come from the brush's Brush.archive.
+
+Stamps are composited in bulk: stacking stamps of alpha a_i "over" each other
+gives 1 - prod(1 - a_i), so the log(1 - a_i) of the stamp footprints are
+summed into the canvas with bincount and exponentiated once. Footprints only
+cover the pixels inside the largest stamp's disc, and stamps are processed in
+chunks of at most STAMP_CHUNK pixels, so memory stays at a few tens of MB
+however large previewSize makes the tip.
+
+	python stroke_preview.py build_brushes.tmp/1.brush -o preview.png
+"""
+
+import argparse
+import io
+import plistlib
+import time
+import zipfile
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from rewrite_settings import uid_index
+
+default_archive = Path(__file__).parent/"template"/"Brush.archive"
+
+CANVAS_SIZE = (1060, 324)
+# stamp diameter at previewSize 1.0, as a fraction of the canvas height
+STROKE_DIAMETER = 0.3
+# grain tile edge at textureScale 1.0, as a fraction of the canvas height
+TEXTURE_TILE = 0.8
+# per-stamp opacity before the stroke's own opacity is applied
+STAMP_FLOW = 0.35
+# stamps closer than this (in diameters) are merged, bounding the stamp count
+MIN_SPACING = 0.02
+# footprint pixels (stamps x disc) composited per bincount, bounds the temporaries
+STAMP_CHUNK = 1 << 19
+# control points of the stroke, as fractions of the canvas
+STROKE_PATH = ((0.07, 0.68), (0.38, -0.15), (0.62, 1.15), (0.93, 0.32))
+
+SETTINGS = {
+	"plotSpacing": 0.1,
+	"previewSize": 1.0,
+	"paintOpacity": 1.0,
+	"maxOpacity": 1.0,
+	"taperStartLength": 0.0,
+	"taperEndLength": 0.0,
+	"taperSize": 0.0,
+	"textureScale": 1.0,
+	"grainDepth": 1.0,
+}
+
+
+def read_settings(archive):
+	"""The stroke-related settings stored in Brush.archive bytes."""
+	data = plistlib.loads(archive)
+	root = data["$objects"][uid_index(data["$top"]["root"])]
+	return {key: float(root.get(key, default)) for key, default in SETTINGS.items()}
+
+
+@lru_cache(maxsize=8)
+def archive_settings(path=default_archive):
+	"""Settings of a Brush.archive file, read once per path."""
+	return read_settings(Path(path).read_bytes())
+
+
+@lru_cache(maxsize=8)
+def stroke_path(size, samples=512):
+	"""(x, y, arc length) of the cubic Bezier stroke sampled densely across `size`."""
+	t = np.linspace(0, 1, samples)[:, None]
+	points = np.array(STROKE_PATH) * size
+	curve = (
+		(1 - t)**3 * points[0] + 3 * (1 - t)**2 * t * points[1]
+		+ 3 * (1 - t) * t**2 * points[2] + t**3 * points[3]
+	)
+	length = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(curve, axis=0).T))))
+	return curve[:, 0], curve[:, 1], length
+
+
+def taper(position, settings):
+	"""Size multiplier at each `position` (0..1 along the stroke) from the taper settings."""
+	scale = np.ones_like(position)
+	amount = settings["taperSize"]
+	for length, distance in (
+		(settings["taperStartLength"], position),
+		(settings["taperEndLength"], 1 - position),
+	):
+		if length > 0:
+			ramp = np.clip(distance / length, 0, 1)
+			scale = np.minimum(scale, 1 - amount * (1 - ramp))
+	return np.clip(scale, 0.05, 1)
+
+
+def stamp_positions(settings, size):
+	"""Centres and radii of every stamp along the stroke."""
+	diameter = STROKE_DIAMETER * size[1] * settings["previewSize"]
+	step = max(settings["plotSpacing"], MIN_SPACING) * diameter
+	x, y, length = stroke_path(size)
+	along = np.arange(0, length[-1], max(step, 1.0))
+	cx = np.interp(along, length, x)
+	cy = np.interp(along, length, y)
+	radius = diameter / 2 * taper(along / length[-1], settings)
+	return cx, cy, radius
+
+
+@lru_cache(maxsize=8)
+def disc_offsets(reach):
+	"""(dy, dx) of every pixel offset within `reach` of a stamp centre."""
+	dy, dx = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+	inside = dy**2 + dx**2 <= reach**2
+	return dy[inside].astype(np.int32), dx[inside].astype(np.int32)
+
+
+def stroke_coverage(settings, size=CANVAS_SIZE):
+	"""Alpha (0..1, float32, shape (h, w)) of the stroke before texturing."""
+	width, height = size
+	cx, cy, radius = stamp_positions(settings, size)
+	if not len(radius) or radius.max() <= 0:
+		return np.zeros((height, width), dtype=np.float32)
+
+	# one footprint big enough for the largest stamp, offset to every centre
+	reach = int(np.ceil(radius.max())) + 1
+	dy, dx = disc_offsets(reach)
+	log_clear = np.zeros(width * height)
+	chunk = max(1, STAMP_CHUNK // len(dy))
+	for start in range(0, len(cx), chunk):
+		sx, sy, sr = cx[start:start + chunk, None], cy[start:start + chunk, None], radius[start:start + chunk, None]
+		px = np.rint(sx).astype(np.int32) + dx  # (stamps, footprint)
+		py = np.rint(sy).astype(np.int32) + dy
+		dist = np.hypot(px - sx, py - sy).astype(np.float32) / sr.astype(np.float32)
+
+		# soft round tip: solid core fading out over the outer third
+		alpha = STAMP_FLOW * np.clip((1 - dist) * 3, 0, 1)
+		inside = (alpha > 0) & (px >= 0) & (px < width) & (py >= 0) & (py < height)
+		log_clear += np.bincount((py * width + px)[inside], weights=np.log1p(-alpha[inside]), minlength=width * height)
+	return (-np.expm1(log_clear)).astype(np.float32).reshape(height, width)
+
+
+def grain_texture(grain, settings, size=CANVAS_SIZE):
+	"""The grain tiled over the canvas at the brush's texture scale, as 0..1 floats."""
+	tile = max(8, round(TEXTURE_TILE * size[1] * settings["textureScale"]))
+	grain = grain.convert("L")
+	factor = min(grain.size) // (tile * 2)
+	if factor > 1:
+		grain = grain.reduce(factor)
+	tile_size = (tile, max(1, round(tile * grain.height / grain.width)))
+	texture = np.asarray(grain.resize(tile_size, Image.BILINEAR), dtype=np.float32) / 255
+	reps = (-(-size[1] // texture.shape[0]), -(-size[0] // texture.shape[1]))
+	return np.tile(texture, reps)[:size[1], :size[0]]
+
+
+def render_stroke(grain, settings=None, size=CANVAS_SIZE):
+	"""RGBA stroke preview (white paint on transparent) of a brush with this grain."""
+	settings = settings or archive_settings()
+	coverage = stroke_coverage(settings, size)
+	depth = settings["grainDepth"]
+	texture = 1 - depth + depth * grain_texture(grain, settings, size)
+	alpha = coverage * texture * (settings["paintOpacity"] * settings["maxOpacity"] * 255)
+
+	rgba = np.full((size[1], size[0], 4), 255, dtype=np.uint8)
+	rgba[..., 3] = np.clip(alpha, 0, 255).astype(np.uint8)
+	return Image.fromarray(rgba, "RGBA")
+
+
+def brush_preview(brush_file, size=CANVAS_SIZE):
+	"""Stroke preview of a built .brush, using its own grain and settings."""
+	with zipfile.ZipFile(brush_file) as zf:
+		settings = read_settings(zf.read("Brush.archive"))
+		grain = Image.open(io.BytesIO(zf.read("Grain.png")))
+		grain.load()
+	return render_stroke(grain, settings, size)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Render a stroke preview for a .brush or grain image")
+	parser.add_argument("input", help=".brush file, or a grain image used with --archive settings")
+	parser.add_argument("-o", "--output", default="preview.png")
+	parser.add_argument("--archive", default=default_archive, help="Brush.archive to read settings from for a grain image")
+	args = parser.parse_args()
+
+	start = time.perf_counter()
+	if args.input.endswith(".brush"):
+		preview = brush_preview(args.input)
+	else:
+		preview = render_stroke(Image.open(args.input), archive_settings(args.archive))
+	print(f"Rendered in {(time.perf_counter() - start) * 1000:.1f} ms")
+	preview.save(args.output)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+"""
+Rasterize SVG patterns straight into grain arrays for creator2.
+
+The bundled `repo/` project turns its FGDC SVG patterns into PNGs with a
+separate Node/cairo toolchain before creator2 can read them from
+Samples.tmp. This module does the same in-process: SVGs are rasterized in
+parallel at the target resolution, converted to grains (ink is white, as in
+`repo/procreate-brushes/create-brushes`) and handed to brush generation as
+arrays, with no intermediate PNG directory.
+
+Rasterizers are pluggable backends registered in `BACKENDS`; rendered grains
+are cached on disk keyed by SVG content hash, resolution and backend.
+"""
+
+import hashlib
+import io
+import os
+import re
+import shutil
+import subprocess
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+here = Path(__file__).parent
+
+svgdir = here/"repo"/"assets"/"svg"
+cachedir = here/"svg_cache.tmp"
+
+# same selection as repo/procreate-brushes/create-brushes: the black variant
+# of each pattern, or the pattern itself when it has no colour variants
+default_pattern = r"(\d{3})(-K)?"
+
+BACKENDS = {}
+
+
+def register_backend(name):
+	"""Register a rasterizer `fn(svg_bytes, (width, height)) -> RGBA ndarray`."""
+	def wrap(fn):
+		BACKENDS[name] = fn
+		return fn
+	return wrap
+
+
+@register_backend("cairosvg")
+def render_cairosvg(svg_bytes, size):
+	import cairosvg
+	png = cairosvg.svg2png(bytestring=svg_bytes, output_width=size[0], output_height=size[1])
+	return np.asarray(Image.open(io.BytesIO(png)).convert("RGBA"))
+
+
+@register_backend("rsvg-convert")
+def render_rsvg(svg_bytes, size):
+	if shutil.which("rsvg-convert") is None:
+		raise ImportError("rsvg-convert is not installed")
+	png = subprocess.run(
+		["rsvg-convert", "-w", str(size[0]), "-h", str(size[1]), "-f", "png"],
+		input=svg_bytes, capture_output=True, check=True,
+	).stdout
+	return np.asarray(Image.open(io.BytesIO(png)).convert("RGBA"))
+
+
+def backend_available(name):
+	"""Check that a backend's library or binary can actually be loaded."""
+	if name == "cairosvg":
+		try:
+			import cairosvg  # noqa: F401
+		except (ImportError, OSError):
+			# cairosvg raises OSError when libcairo itself is missing
+			return False
+		return True
+	if name == "rsvg-convert":
+		return shutil.which("rsvg-convert") is not None
+	return name in BACKENDS
+
+
+def pick_backend(name=None):
+	"""Return the requested backend name, or the first one usable on this machine."""
+	if name:
+		if name not in BACKENDS:
+			raise ValueError(f"Unknown SVG backend {name!r}, choose from {sorted(BACKENDS)}")
+		return name
+	for candidate in BACKENDS:
+		if backend_available(candidate):
+			return candidate
+	raise RuntimeError(f"No SVG backend available, install one of {sorted(BACKENDS)}")
+
+
+def svg_size(svg_bytes, max_edge):
+	"""Pixel size for rendering an SVG with its longest edge at `max_edge`."""
+	root = ET.fromstring(svg_bytes)
+	width, height = None, None
+	if "viewBox" in root.attrib:
+		_, _, width, height = (float(v) for v in re.split(r"[\s,]+", root.attrib["viewBox"].strip()))
+	else:
+		number = re.compile(r"[\d.]+")
+		width = float(number.match(root.attrib.get("width", "1")).group())
+		height = float(number.match(root.attrib.get("height", "1")).group())
+	scale = max_edge / max(width, height)
+	return (max(1, round(width * scale)), max(1, round(height * scale)))
+
+
+def rgba_to_grain(rgba):
+	"""Flatten onto white and invert, so inked parts of the pattern are white."""
+	rgb = rgba[..., :3].astype(np.float32)
+	alpha = rgba[..., 3:4].astype(np.float32) / 255
+	flat = rgb * alpha + 255 * (1 - alpha)
+	luma = flat @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+	return np.clip(255.5 - luma, 0, 255).astype(np.uint8)
+
+
+def cache_path(svg_bytes, max_edge, backend):
+	"""Cache file for an SVG rendered at `max_edge` by `backend`."""
+	digest = hashlib.sha256(svg_bytes).hexdigest()
+	return cachedir/f"{digest[:32]}-{max_edge}-{backend}.npy"
+
+
+def rasterize(svg_path, max_edge, backend, use_cache=True):
+	"""Render one SVG into an L grain array, through the on-disk cache."""
+	svg_bytes = Path(svg_path).read_bytes()
+	cached = cache_path(svg_bytes, max_edge, backend)
+	if use_cache and cached.exists():
+		return np.load(cached)
+
+	grain = rgba_to_grain(BACKENDS[backend](svg_bytes, svg_size(svg_bytes, max_edge)))
+	if use_cache:
+		cachedir.mkdir(exist_ok=True)
+		tmp = cached.with_suffix(".part")
+		with open(tmp, "wb") as f:
+			np.save(f, grain)
+		tmp.replace(cached)
+	return grain
+
+
+def _rasterize_task(args):
+	svg_path, max_edge, backend, use_cache = args
+	name = Path(svg_path).stem
+	try:
+		return name, rasterize(svg_path, max_edge, backend, use_cache), None
+	except Exception as e:
+		# reported as text: not every backend's exception survives pickling back
+		return name, None, f"{type(e).__name__}: {e}"
+
+
+def _task_result(future, name):
+	try:
+		return future.result()
+	except Exception as e:
+		# the pool itself failed, e.g. BrokenProcessPool after a worker was killed
+		return name, None, f"{type(e).__name__}: {e}"
+
+
+def find_svgs(folder=svgdir, pattern=default_pattern):
+	"""SVGs in `folder` whose stem matches `pattern`, sorted by name."""
+	return sorted(f for f in Path(folder).glob("*.svg") if re.fullmatch(pattern, f.stem))
+
+
+def iter_grains(svg_paths, max_edge=1024, backend=None, workers=None, use_cache=True):
+	"""
+	Rasterize SVGs in a process pool, yielding (name, grain array, error) in order.
+
+	Results stream back in submission order, so brush generation can start on
+	the first pattern while later ones are still rendering. Only two grains
+	per worker are rendered ahead of the consumer, so a slow consumer holds
+	back the pool instead of collecting every grain in memory. A pattern that
+	fails to render comes back with no grain and the error text, so one bad
+	SVG doesn't stop the rest.
+	"""
+	backend = pick_backend(backend)
+	workers = workers or os.cpu_count()
+	tasks = [(str(p), max_edge, backend, use_cache) for p in svg_paths]
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		in_flight = deque()
+		for task in tasks:
+			in_flight.append((executor.submit(_rasterize_task, task), Path(task[0]).stem))
+			if len(in_flight) >= workers * 2:
+				yield _task_result(*in_flight.popleft())
+		while in_flight:
+			yield _task_result(*in_flight.popleft())
+
+
+def build_from_svgs(set_name, folder=svgdir, pattern=default_pattern, max_edge=1024, backend=None, workers=None, normalizer=None, memory_budget_mb=None):
+	"""
+	Build a brush set straight from SVG patterns, without writing any PNGs.
+
+	Grains go through creator2's brush pipeline. Each one reserves its size
+	against a MemoryBudget before it's queued, so rasterizing waits for the
+	pipeline instead of running ahead of it. Patterns that fail to rasterize
+	or to build are skipped and listed at the end, like creator2 does for
+	sources.
+	"""
+	import creator2
+	from memory_budget import MemoryBudget
+	from pipeline import Pipeline, Stage
+
+	# fail on a missing backend before any pool or pipeline is started
+	backend = pick_backend(backend)
+	svg_paths = find_svgs(folder, pattern)
+	print(f"Rasterizing {len(svg_paths)} SVG patterns from {folder} at {max_edge}px")
+
+	budget = MemoryBudget((memory_budget_mb or creator2.default_memory_budget_mb) * 1024**2)
+	brush_ids = []
+	failed = []
+
+	def finished(job, error):
+		budget.release(job["estimate"])
+		if error is None:
+			brush_ids.append(job["brush_id"])
+		else:
+			failed.append((job["brush_id"], f"{type(error).__name__}: {error}"))
+
+	def jobs():
+		for name, grain, error in iter_grains(svg_paths, max_edge, backend, workers):
+			if error is not None:
+				print(f"Skipping pattern {name}: {error}")
+				failed.append((name, error))
+				continue
+			brush_id = re.sub(r"-K$", "", name)
+			job = creator2.new_brush_job(Image.fromarray(grain, "L"), brush_id, normalizer)
+			# the grain, plus the copy decode_stage and normalization make of it
+			job["estimate"] = grain.nbytes * 3
+			budget.acquire(job["estimate"], label=brush_id)
+			yield job
+
+	stage_fns = {
+		"decode": creator2.decode_stage,
+		"grain": creator2.grain_stage,
+		"thumbnail": creator2.thumbnail_stage,
+		"encode": creator2.encode_stage,
+		"package": creator2.package_stage,
+	}
+	pipeline = Pipeline([Stage(name, fn, creator2.default_stage_workers[name], creator2.stage_queue_size) for name, fn in stage_fns.items()], on_exit=finished)
+	pipeline.run(jobs())
+	pipeline.report()
+	print(f"Peak reserved memory: {budget.peak / 2**20:.0f} MiB")
+	if failed:
+		print(f"Skipped {len(failed)} patterns that failed:")
+		for name, error in failed:
+			print(f"  {name}: {error}")
+	if not brush_ids:
+		print("No patterns rasterized, no brush set written")
+		return brush_ids
+
+	# pattern order, not completion order
+	brush_ids.sort(key=[re.sub(r"-K$", "", p.stem) for p in svg_paths].index)
+	creator2.generate_brush_set(brush_ids, set_name)
+	return brush_ids
+
+
+if __name__ == "__main__":
+	import argparse
+	import time
+	parser = argparse.ArgumentParser(description="Build a brush set straight from SVG patterns")
+	parser.add_argument("set_name", nargs="?", default="FGDC geology patterns")
+	parser.add_argument("--svg-dir", type=Path, default=svgdir)
+	parser.add_argument("--pattern", default=default_pattern, help="regex the SVG file stem must fully match")
+	parser.add_argument("--size", type=int, default=1024, help="longest edge of the rasterized grain")
+	parser.add_argument("--backend", choices=sorted(BACKENDS), default=None)
+	parser.add_argument("--workers", type=int, default=None)
+	parser.add_argument("--memory-budget-mb", type=int, default=None, help="RAM the queued grains may take, default creator2's budget")
+	args = parser.parse_args()
+
+	start = time.time()
+	build_from_svgs(args.set_name, args.svg_dir, args.pattern, args.size, args.backend, args.workers, memory_budget_mb=args.memory_budget_mb)
+	print(f"Time taken: {time.time()-start:.2f} seconds")
@@ -0,0 +1,199 @@
+"""
+Pre-build filter for duplicate and blank textures.
+
+Sample folders often hold the same texture exported twice, or images that are
+empty or a single flat colour. Before any brush is scheduled, every source
+gets a cheap signature in a worker process: the SHA-256 of the file, a 64x64
+grey thumbnail and a 64-bit DCT hash of it. Sources are then dropped (or only
+flagged) when they are
+
+	blank           the thumbnail's standard deviation is below BLANK_STD
+	duplicate       byte-identical to an earlier source
+	near-duplicate  within NEAR_DUPLICATE_BITS of an earlier source's hash,
+	                and within NEAR_DUPLICATE_DIFF of its thumbnail
+
+"Earlier" is by brush id, so the first copy of a texture is the one kept. The
+hash ignores brightness, contrast and lighting gradients (the thumbnail is
+detrended before the DCT, and the DC term is skipped), so textures that only
+share a gradient don't collide. A hash match whose thumbnails still differ is
+only flagged, never dropped. Hash matches are found with catalog_index's
+multi-index HashIndex (sources bucketed by equal 16-bit bands), so the
+near-duplicate pass stays close to linear in the number of sources.
+
+Decoding runs at reduced size (JPEG draft, then an integer reduce), and every
+source reserves its estimated decoded size against a MemoryBudget before it
+goes to the pool, so huge scans can't exhaust RAM in this pre-pass either.
+"""
+
+import hashlib
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from memory_budget import MemoryBudget, estimate_decoded_bytes
+
+# the DCT and the hash index are shared with the brush catalog
+video_app_dir = Path(__file__).parent.parent.parent/"BrushSet-Video"
+if str(video_app_dir) not in sys.path:
+	sys.path.insert(0, str(video_app_dir))
+from catalog_index import HashIndex, dct_matrix
+
+THUMB_SIZE = 64
+# 0..255 grey levels; scanned paper with no marks on it stays below this
+BLANK_STD = 2.0
+# of 64 hash bits
+NEAR_DUPLICATE_BITS = 8
+# RMS difference of the detrended thumbnails, in units of their contrast;
+# re-encodes and rescales stay below 0.2, unrelated textures are around 1.4
+NEAR_DUPLICATE_DIFF = 0.3
+HASH_SAMPLE = 32
+READ_CHUNK = 1 << 20
+
+
+@lru_cache(maxsize=None)
+def hash_terms():
+	"""(rows, cols) of the 64 lowest-frequency DCT terms after DC, in zigzag order."""
+	terms = sorted(((u, v) for u in range(12) for v in range(12) if u + v), key=lambda t: (t[0] + t[1], t[0]))[:64]
+	return tuple(np.array(axis) for axis in zip(*terms))
+
+
+def normalize_thumb(thumb):
+	"""Remove the best-fit plane (brightness and lighting gradient) and scale to unit contrast."""
+	y, x = np.mgrid[0:thumb.shape[0], 0:thumb.shape[1]]
+	basis = np.stack([np.ones(thumb.size), x.ravel(), y.ravel()], axis=1)
+	coeffs, *_ = np.linalg.lstsq(basis, thumb.ravel(), rcond=None)
+	residual = thumb - (basis @ coeffs).reshape(thumb.shape)
+	return residual / max(residual.std(), 1e-6)
+
+
+def texture_hash(thumb):
+	"""64-bit DCT hash of a 64x64 thumbnail, insensitive to brightness and gradients."""
+	sample = normalize_thumb(thumb).reshape(HASH_SAMPLE, 2, HASH_SAMPLE, 2).mean(axis=(1, 3))
+	dct = dct_matrix(HASH_SAMPLE)
+	low = (dct @ sample @ dct.T)[hash_terms()]
+	bits = np.packbits(low > np.median(low))
+	return int.from_bytes(bits.tobytes(), "big")
+
+
+def file_sha256(path):
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		while chunk := f.read(READ_CHUNK):
+			digest.update(chunk)
+	return digest.digest()
+
+
+def load_thumb(path):
+	"""(64x64 grey float32 thumbnail, source size), decoding no more than needed."""
+	with Image.open(path) as img:
+		size = img.size
+		# JPEGs decode straight at 1/2..1/8 scale, the others are box-reduced right after decoding
+		img.draft("L", (THUMB_SIZE * 2, THUMB_SIZE * 2))
+		factor = min(img.size) // (THUMB_SIZE * 2)
+		if factor > 1 and img.mode in ("L", "LA", "RGB", "RGBA", "I", "F"):
+			img = img.reduce(factor)
+		thumb = img.convert("L").resize((THUMB_SIZE, THUMB_SIZE), Image.BOX)
+	return np.asarray(thumb, dtype=np.float32), size
+
+
+def signature(path):
+	"""(sha256, thumbnail std, texture hash, 64x64 thumbnail, source pixels) of one source image."""
+	thumb, size = load_thumb(path)
+	return file_sha256(path), float(thumb.std()), texture_hash(thumb), thumb.astype(np.uint8), size[0] * size[1]
+
+
+def _safe_signature(path):
+	try:
+		return signature(path)
+	except Exception:
+		return None  # unreadable sources are left for the build to report
+
+
+def thumb_difference(a, b):
+	"""RMS difference of two thumbnails once brightness, gradient and contrast are normalized."""
+	diff = normalize_thumb(a.astype(np.float32)) - normalize_thumb(b.astype(np.float32))
+	return float(np.sqrt(np.mean(diff**2)))
+
+
+def signatures(paths, workers=None, memory_budget_mb=2048):
+	"""Signatures of `paths` from a process pool, with each decode admitted against the memory budget."""
+	budget = MemoryBudget(memory_budget_mb * 1024**2)
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		futures = []
+		for path in paths:
+			estimate = estimate_decoded_bytes(path, THUMB_SIZE * 2)
+			budget.acquire(estimate, label=path.name)
+			future = executor.submit(_safe_signature, path)
+			future.add_done_callback(lambda _, estimate=estimate: budget.release(estimate))
+			futures.append(future)
+		return [future.result() for future in futures]
+
+
+def find_redundant(sources, workers=None, memory_budget_mb=2048):
+	"""
+	Check (brush_id, path) sources, which must be sorted by brush id.
+
+	Returns ({index: (reason, droppable)} for every suspicious source,
+	[source pixels or 0 when unreadable]). Only blank sources, exact
+	duplicates and near-duplicates confirmed by their thumbnails are
+	droppable.
+	"""
+	sigs = signatures([path for _, path in sources], workers, memory_budget_mb)
+	pixels = [sig[4] if sig else 0 for sig in sigs]
+
+	findings = {}
+	seen = {}
+	valid = []
+	for i, sig in enumerate(sigs):
+		if sig is None:
+			continue
+		digest, std, *_ = sig
+		if std < BLANK_STD:
+			findings[i] = (f"blank (std {std:.1f})", True)
+		elif digest in seen:
+			findings[i] = (f"duplicate of {sources[seen[digest]][0]}", True)
+		else:
+			seen[digest] = i
+			valid.append(i)
+
+	if len(valid) > 1:
+		hashes = [sigs[i][2] for i in valid]
+		index = HashIndex(hashes)
+		for row, h in enumerate(hashes):
+			# only compare against earlier sources, and never against one already dropped
+			close = sorted(col for col, _ in index.search(h, NEAR_DUPLICATE_BITS) if col < row)
+			for col in close:
+				if valid[col] in findings:
+					continue
+				original = sources[valid[col]][0]
+				difference = thumb_difference(sigs[valid[row]][3], sigs[valid[col]][3])
+				if difference <= NEAR_DUPLICATE_DIFF:
+					findings[valid[row]] = (f"near-duplicate of {original} (difference {difference:.2f})", True)
+					break
+				# hash match alone isn't enough to lose a brush over
+				findings.setdefault(valid[row], (f"possible near-duplicate of {original} (difference {difference:.2f})", False))
+	return findings, pixels
+
+
+def filter_sources(sources, mode="drop", workers=None, memory_budget_mb=2048):
+	"""
+	Check sources before a build.
+
+	Returns (sources to build, pixels in them, [(brush_id, path, reason, pixels)]
+	for the sources dropped). With `mode` "flag" nothing is dropped and the
+	report lists every suspicious source; possible near-duplicates are only
+	ever flagged.
+	"""
+	findings, pixels = find_redundant(sources, workers, memory_budget_mb)
+	dropped = {i for i, (_, droppable) in findings.items() if droppable and mode == "drop"}
+	for i, (reason, _) in sorted(findings.items()):
+		brush_id, path = sources[i]
+		print(f"{'Skipping' if i in dropped else 'Flagged'} {brush_id} ({path.name}): {reason}")
+	listed = dropped if mode == "drop" else findings
+	report = [(*sources[i], findings[i][0], pixels[i]) for i in sorted(listed)]
+	kept = [i for i in range(len(sources)) if i not in dropped]
+	return [sources[i] for i in kept], sum(pixels[i] for i in kept), report
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""
+Validate generated .brush and .brushset files.
+
+Checks every file against the layout in Expected/BrushSet:
+
+	brushset.plist                       (brushset only) name + list of brush UUIDs
+	<UUID>/Brush.archive                 binary plist (bplist00)
+	<UUID>/Grain.png
+	<UUID>/QuickLook/Thumbnail.png
+	<UUID>/Signature/SignaturePicture.png
+
+Only the zip central directory, brushset.plist and the first few bytes of
+each archive and PNG are read, so a large set validates in milliseconds and
+whole build folders can be checked on every build. Uses the standard library
+only, to keep start-up cheap.
+
+	python validate_brushset.py build_brush_sets.tmp --report report.json
+
+Exits 1 when any file has errors (or warnings, with --strict).
+"""
+
+import argparse
+import json
+import plistlib
+import re
+import sys
+import time
+import zipfile
+import zlib
+from pathlib import Path
+
+from rawzip import find_brush_files
+
+PLIST_MAGIC = b"bplist00"
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+# member -> required (error when missing) or expected (warning when missing)
+BRUSH_LAYOUT = {
+	"Brush.archive": True,
+	"Grain.png": True,
+	"QuickLook/Thumbnail.png": True,
+	"Signature/SignaturePicture.png": False,
+}
+
+UUID_RE = re.compile(r"[0-9A-F]{8}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{12}")
+
+
+def head(zf, name, size=8):
+	"""First `size` bytes of a member, decompressing only as much as needed."""
+	with zf.open(name) as f:
+		return f.read(size)
+
+
+def check_brush(zf, names, lowered, prefix, errors, warnings):
+	"""Check one brush's members, rooted at `prefix` ('' for a .brush)."""
+	for member, required in BRUSH_LAYOUT.items():
+		name = prefix + member
+		if name not in names:
+			if name.lower() in lowered:
+				errors.append(f"{name} is stored as {lowered[name.lower()]} (names are case-sensitive)")
+			elif required:
+				errors.append(f"missing {name}")
+			else:
+				warnings.append(f"missing {name}")
+			continue
+
+		magic = PLIST_MAGIC if member.endswith(".archive") else PNG_MAGIC
+		try:
+			data = head(zf, name, len(magic))
+		except (zipfile.BadZipFile, zlib.error, EOFError, OSError, RuntimeError, NotImplementedError) as e:
+			# corrupt data, a truncated file, an encrypted member or an unsupported compression method
+			errors.append(f"{name} can't be read: {e}")
+			continue
+		if data != magic:
+			kind = "binary plist" if magic is PLIST_MAGIC else "PNG"
+			errors.append(f"{name} is not a {kind}")
+
+
+def validate(path, deep=False):
+	"""
+	Validate one .brush or .brushset, returning a JSON-able result.
+
+	Never raises: anything unexpected becomes an error on the file, so one
+	bad file can't abort a batch.
+	"""
+	start = time.perf_counter()
+	path = Path(path)
+	result = {"path": str(path), "kind": path.suffix.lstrip("."), "brushes": 0, "errors": [], "warnings": []}
+	try:
+		check_file(path, deep, result)
+	except Exception as e:
+		result["errors"].append(f"can't be validated: {type(e).__name__}: {e}")
+	result["seconds"] = time.perf_counter() - start
+	return result
+
+
+def check_file(path, deep, result):
+	errors, warnings = result["errors"], result["warnings"]
+	try:
+		zf = zipfile.ZipFile(path)
+	except (zipfile.BadZipFile, OSError) as e:
+		errors.append(f"not a readable zip: {e}")
+		return
+
+	with zf:
+		names = set(zf.namelist())
+		lowered = {n.lower(): n for n in names}
+		for name in names:
+			if name.startswith("/") or ".." in name.split("/"):
+				errors.append(f"unsafe member path {name}")
+
+		if path.suffix == ".brush":
+			result["brushes"] = 1
+			check_brush(zf, names, lowered, "", errors, warnings)
+		else:
+			validate_set(zf, names, lowered, result)
+
+		if deep:
+			try:
+				bad = zf.testzip()
+			except (zipfile.BadZipFile, zlib.error, EOFError, OSError, RuntimeError, NotImplementedError) as e:
+				errors.append(f"members can't be read for the CRC check: {e}")
+			else:
+				if bad:
+					errors.append(f"CRC mismatch in {bad}")
+
+
+def validate_set(zf, names, lowered, result):
+	errors, warnings = result["errors"], result["warnings"]
+	if "brushset.plist" not in names:
+		errors.append("missing brushset.plist")
+		return
+	try:
+		manifest = plistlib.loads(zf.read("brushset.plist"))
+	except Exception as e:
+		errors.append(f"brushset.plist can't be parsed: {e}")
+		return
+
+	name = manifest.get("name")
+	uuids = manifest.get("brushes")
+	if not isinstance(name, str) or not name.strip():
+		errors.append("brushset.plist has no name")
+	result["name"] = name
+	if not isinstance(uuids, list) or not all(isinstance(u, str) for u in uuids):
+		errors.append("brushset.plist 'brushes' is not a list of UUID strings")
+		return
+	if not uuids:
+		errors.append("brushset.plist lists no brushes")
+	result["brushes"] = len(uuids)
+
+	folders = {n.split("/", 1)[0] for n in names if "/" in n}
+	seen = set()
+	for uid in uuids:
+		if uid in seen:
+			errors.append(f"UUID {uid} listed more than once")
+			continue
+		seen.add(uid)
+		if not UUID_RE.fullmatch(uid):
+			warnings.append(f"{uid} is not an upper-case UUID")
+		if uid not in folders:
+			errors.append(f"UUID {uid} listed in brushset.plist has no folder")
+			continue
+		check_brush(zf, names, lowered, uid + "/", errors, warnings)
+
+	for orphan in sorted(folders - seen):
+		warnings.append(f"folder {orphan} is not listed in brushset.plist")
+
+
+def validate_all(paths, workers=None, deep=False):
+	"""Validate every brush file under `paths`, in parallel for larger batches."""
+	files = list(find_brush_files(paths))
+	if len(files) <= 4 or workers == 1:
+		return [validate(f, deep) for f in files]
+	# imported here, it is a large share of start-up for a quick check
+	from concurrent.futures import ProcessPoolExecutor
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		return list(executor.map(validate, files, [deep] * len(files), chunksize=16))
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Validate .brush/.brushset files against the Procreate layout")
+	parser.add_argument("paths", nargs="+", help="files or folders to check")
+	parser.add_argument("--report", default=None, help="write the JSON report here instead of stdout")
+	parser.add_argument("--workers", type=int, default=None)
+	parser.add_argument("--deep", action="store_true", help="also verify every member's CRC (reads everything)")
+	parser.add_argument("--strict", action="store_true", help="treat warnings as failures")
+	args = parser.parse_args()
+
+	start = time.perf_counter()
+	results = validate_all(args.paths, args.workers, args.deep)
+	failed = [r for r in results if r["errors"] or (args.strict and r["warnings"])]
+	report = {
+		"summary": {
+			"files": len(results),
+			"failed": len(failed),
+			"brushes": sum(r["brushes"] for r in results),
+			"errors": sum(len(r["errors"]) for r in results),
+			"warnings": sum(len(r["warnings"]) for r in results),
+			"seconds": round(time.perf_counter() - start, 3),
+		},
+		"files": results,
+	}
+
+	if args.report:
+		with open(args.report, "w") as f:
+			json.dump(report, f, indent=1)
+	else:
+		json.dump(report, sys.stdout, indent=1)
+		print()
+
+	for r in failed:
+		for error in r["errors"] + (r["warnings"] if args.strict else []):
+			print(f"{r['path']}: {error}", file=sys.stderr)
+	sys.exit(1 if failed else 0)
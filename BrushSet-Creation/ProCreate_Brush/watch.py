@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""
+Watch Samples.tmp and rebuild brushes as textures are dropped in.
+
+Polls the sample tree, waits for a burst of changes to settle, then rebuilds
+only the brushes whose source changed and re-assembles only the brush sets
+they belong to. Brushes are built on a pool of worker processes that is
+forked and warmed up (NumPy, PIL, creator2 and the template loaded) before the
+first event, so a drop costs the brush work and nothing else.
+
+Each set keeps its brushes in build_brushes.tmp/<set>/, so brush ids only need
+to be unique within a set folder. On start-up, brushes missing or older than
+their source are built, which brings the output up to date with whatever
+changed while the watcher wasn't running.
+
+Builds are admitted against a MemoryBudget by their estimated decoded size,
+like creator2's pipeline, so a burst of huge scans can't run the box out of
+memory. A brush or set that fails (including a worker killed by the OOM
+killer, which breaks the whole pool) is logged and left out of the recorded
+state, so it's tried again on the next change; a broken pool is replaced.
+
+	python watch.py --debounce 1.5
+"""
+
+import argparse
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import creator2
+from grain_normalize import GrainNormalizer
+from memory_budget import MemoryBudget, estimate_decoded_bytes
+
+
+def _warm_worker():
+	"""Load everything a brush build touches, once per worker process."""
+	import numpy  # noqa: F401
+	from PIL import Image, PngImagePlugin, JpegImagePlugin  # noqa: F401
+	(creator2.template/"Brush.archive").read_bytes()
+	return os.getpid()
+
+
+def _build_brush(source, brush_id, brush_dir, normalization):
+	normalizer = GrainNormalizer(*normalization) if normalization else None
+	creator2.generate_individual_brush(source, brush_id, normalizer, brush_dir)
+	return brush_id
+
+
+def snapshot(root):
+	"""Map each brush source under `root` to (set name, brush id, mtime_ns, size)."""
+	state = {}
+	for folder in root.iterdir():
+		if not folder.is_dir():
+			continue
+		for brush_id, path in creator2.find_sources(folder):
+			try:
+				stat = path.stat()
+			except FileNotFoundError:
+				continue  # removed while scanning
+			state[path] = (folder.name, brush_id, stat.st_mtime_ns, stat.st_size)
+	return state
+
+
+class Watcher:
+	def __init__(self, root=creator2.indir, workers=4, poll=0.5, debounce=1.0, normalization=None, memory_budget_mb=creator2.default_memory_budget_mb):
+		self.root = Path(root)
+		self.poll = poll
+		self.debounce = debounce
+		self.normalization = normalization
+		self.workers = workers
+		self.budget = MemoryBudget(memory_budget_mb * 1024**2)
+		self.state = {}
+		self.executor = None
+		self.start_executor()
+
+	def start_executor(self):
+		"""(Re)create the worker pool, replacing a broken one."""
+		if self.executor is not None:
+			self.executor.shutdown(wait=False, cancel_futures=True)
+		self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+		# fork every worker now rather than on the first event
+		wait([self.executor.submit(_warm_worker) for _ in range(self.workers)])
+
+	def submit(self, path, brush_id, brush_dir):
+		"""Queue one brush build once its estimated memory fits in the budget."""
+		estimate = estimate_decoded_bytes(path, self.normalization[0] if self.normalization else None)
+		self.budget.acquire(estimate, label=path.name)
+		try:
+			try:
+				future = self.executor.submit(_build_brush, path, brush_id, brush_dir, self.normalization)
+			except BrokenProcessPool:
+				print("Restarting worker pool")
+				self.start_executor()
+				future = self.executor.submit(_build_brush, path, brush_id, brush_dir, self.normalization)
+		except BaseException:
+			self.budget.release(estimate)
+			raise
+		future.add_done_callback(lambda _: self.budget.release(estimate))
+		return future
+
+	def brush_dir(self, set_name):
+		path = creator2.outdir/set_name
+		path.mkdir(parents=True, exist_ok=True)
+		return path
+
+	def stale(self, state):
+		"""Sources whose brush is missing or older than the source itself."""
+		changed = []
+		for path, (set_name, brush_id, mtime_ns, _) in state.items():
+			brush = creator2.outdir/set_name/f"{brush_id}.brush"
+			if not brush.exists() or brush.stat().st_mtime_ns < mtime_ns:
+				changed.append(path)
+		return changed
+
+	def rebuild(self, new_state, changed, removed):
+		"""
+		Rebuild the changed brushes and re-assemble the sets they belong to.
+
+		Returns the sets touched and the paths that failed, either their own
+		brush or the set they belong to.
+		"""
+		sets = {self.state.get(p, new_state.get(p))[0] for p in changed + removed}
+
+		for path in removed:
+			set_name, brush_id = self.state[path][:2]
+			(creator2.outdir/set_name/f"{brush_id}.brush").unlink(missing_ok=True)
+
+		futures = {}
+		for path in changed:
+			set_name, brush_id = new_state[path][:2]
+			futures[self.submit(path, brush_id, self.brush_dir(set_name))] = (path, self.executor)
+		failed = set()
+		broken = set()
+		for future, (path, executor) in futures.items():
+			try:
+				future.result()
+			except BrokenProcessPool:
+				print(f"Worker pool broke while building {path}")
+				broken.add(executor)
+				failed.add(path)
+			except Exception as e:
+				traceback.print_exception(type(e), e, e.__traceback__)
+				failed.add(path)
+		if self.executor in broken:
+			print("Restarting worker pool")
+			self.start_executor()
+
+		for set_name in sorted(sets):
+			try:
+				ids = sorted(
+					{bid for p, (s, bid, _, _) in new_state.items() if s == set_name and p not in failed},
+					key=int,
+				)
+				ids = [bid for bid in ids if (creator2.outdir/set_name/f"{bid}.brush").exists()]
+				if ids:
+					creator2.generate_brush_set(ids, set_name, creator2.outdir/set_name)
+				else:
+					(creator2.setdir/f"{set_name}.brushset").unlink(missing_ok=True)
+					print(f"Removed empty brush set {set_name}")
+			except Exception as e:
+				print(f"Failed to assemble brush set {set_name}")
+				traceback.print_exception(type(e), e, e.__traceback__)
+				failed.update(p for p in changed + removed if self.state.get(p, new_state.get(p))[0] == set_name)
+		return sets, failed
+
+	def handle(self, new_state, changed, removed, detected):
+		start = time.time()
+		sets, failed = self.rebuild(new_state, changed, removed)
+		done = time.time()
+
+		# latency from the file landing on disk (its mtime) to the set being written;
+		# copies that keep an older mtime are clamped to one poll before detection
+		dropped = min((new_state[p][2] / 1e9 for p in changed), default=detected)
+		dropped = max(dropped, detected - self.poll)
+		print(
+			f"[watch] {len(changed)} changed, {len(removed)} removed -> {', '.join(sorted(sets))}: "
+			f"drop-to-brushset {done - dropped:.2f}s (detect {detected - dropped:.2f}s, "
+			f"debounce {start - detected:.2f}s, build {done - start:.2f}s)",
+			flush=True,
+		)
+		# failed paths keep their old state, so the next change retries them
+		state = dict(new_state)
+		for path in failed:
+			if path in self.state:
+				state[path] = self.state[path]
+			else:
+				state.pop(path, None)
+		if failed:
+			print(f"[watch] {len(failed)} failed, retried on the next change")
+		self.state = state
+
+	def run(self):
+		print(f"Watching {self.root} (poll {self.poll}s, debounce {self.debounce}s)")
+		initial = snapshot(self.root)
+		stale = self.stale(initial)
+		self.state = {p: v for p, v in initial.items() if p not in stale}
+		if stale:
+			print(f"Bringing {len(stale)} out-of-date brushes up to date")
+			self.handle(initial, stale, [], time.time())
+
+		pending = None  # (first detection time, last change time)
+		last_seen = initial
+		while True:
+			time.sleep(self.poll)
+			current = snapshot(self.root)
+			now = time.time()
+			if current != last_seen:
+				pending = (pending[0] if pending else now, now)
+				last_seen = current
+				continue
+			if pending and now - pending[1] >= self.debounce:
+				changed = [p for p, v in current.items() if self.state.get(p) != v]
+				removed = [p for p in self.state if p not in current]
+				if changed or removed:
+					self.handle(current, changed, removed, pending[0])
+				pending = None
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Rebuild brushes and brush sets as Samples.tmp changes")
+	parser.add_argument("--root", type=Path, default=creator2.indir)
+	parser.add_argument("--workers", type=int, default=4)
+	parser.add_argument("--poll", type=float, default=0.5, help="seconds between scans of the sample tree")
+	parser.add_argument("--debounce", type=float, default=1.0, help="quiet period before a burst of changes is built")
+	parser.add_argument("--grain-max-edge", type=int, default=None)
+	parser.add_argument("--grain-power-of-two", action="store_true")
+	parser.add_argument("--memory-budget-mb", type=int, default=creator2.default_memory_budget_mb, help="RAM the brush builds in flight may take")
+	args = parser.parse_args()
+
+	normalization = None
+	if args.grain_max_edge or args.grain_power_of_two:
+		normalization = (args.grain_max_edge, args.grain_power_of_two)
+
+	try:
+		Watcher(args.root, args.workers, args.poll, args.debounce, normalization, args.memory_budget_mb).run()
+	except KeyboardInterrupt:
+		print("Stopped watching")
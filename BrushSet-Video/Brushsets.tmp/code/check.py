@@ -1,28 +1,21 @@
 import os
 import csv
 import zipfile
-import tempfile
 import plistlib
 
 def get_brushset_name(brushset_path):
     try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            with zipfile.ZipFile(brushset_path, 'r') as zip_ref:
-                zip_ref.extractall(tmpdir)
-            
-            plist_path = os.path.join(tmpdir, 'brushset.plist')
-            if os.path.exists(plist_path):
-                with open(plist_path, 'rb') as f:
-                    plist_data = plistlib.load(f)
-                    return plist_data.get('name', 'Name not found')
-            return "brushset.plist missing"
+        # only brushset.plist is needed, read it straight from the zip
+        with zipfile.ZipFile(brushset_path, 'r') as zip_ref:
+            if 'brushset.plist' not in zip_ref.namelist():
+                return "brushset.plist missing"
+            plist_data = plistlib.loads(zip_ref.read('brushset.plist'))
+            return plist_data.get('name', 'Name not found')
     except Exception as e:
         return f"Error: {str(e)}"
 
-def main():
+def main(output_csv='brushset_video_report.csv', video_folder='video.tmp'):
     video_extensions = ['mp4', 'mov', 'avi', 'mkv', 'flv', 'wmv', 'mpeg']
-    output_csv = 'brushset_video_report.csv'
-    video_folder = 'video.tmp'
 
     # Get all brushsets
     brushsets = []
@@ -95,4 +88,9 @@ def main():
     print(f"Found {len(video_map)} video base names in {video_folder}")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Report which .brushset files in the current folder have a preview video")
+    parser.add_argument('--output', default='brushset_video_report.csv', help="CSV report to write")
+    parser.add_argument('--video-folder', default='video.tmp', help="folder holding the rendered videos")
+    args = parser.parse_args()
+    main(args.output, args.video_folder)
\ No newline at end of file
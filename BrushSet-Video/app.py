@@ -1,15 +1,34 @@
 import os
+import sys
+import time
 import random
+from pathlib import Path
 from typing import Dict, List
-from moviepy.editor import *
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+# the clip classes directly, moviepy.editor would import every effect and preview backend
+from moviepy.video.VideoClip import ImageClip
+from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
+from moviepy.video.fx.resize import resize
 import numpy as np
-from scipy.integrate import cumulative_trapezoid as np_cumtrapz
 from PIL import Image, ImageDraw, ImageFont
 from PIL_toolbelt import textsize
 
 import extract_brushes
 import graph
 
+# stage instrumentation is shared with the brush creator, which has it loaded
+# when it renders set videos; run on its own, app.py loads it for --metrics
+try:
+	import instrument
+except ImportError:
+	instrument = None
+
+here = Path(__file__).parent
+creator_dir = here.parent/"BrushSet-Creation"/"ProCreate_Brush"
+assets = here/"Assets"
+
 # Configuration
 SS = 1
 screen_size = (595, 962)
@@ -24,6 +43,10 @@ SSimg = (image_size[0]*SS, image_size[1]*SS)
 SSpaddingY = paddingY*SS
 SSfontSize = fontSize * SS
 
+# processes rendering brush cards for the strip; small sets are rendered inline
+card_workers = os.cpu_count()
+inline_cards = 8
+
 ImageBGColor = (51, 48, 51)
 OverAllBGColor = (42, 40, 40)
 TextColor = (196, 193, 196)
@@ -49,7 +72,7 @@ def load_cover(cover_path, brush_name):
 
 	# load font
 	while True:
-		font = ImageFont.truetype("Assets/NimbusSanL-Bol.otf", name_font_size)
+		font = ImageFont.truetype(str(assets/"NimbusSanL-Bol.otf"), name_font_size)
 		text_width, text_height = textsize(brush_name, font=font)
 		if text_width <= 180:
 			break
@@ -72,19 +95,40 @@ def load_cover(cover_path, brush_name):
 
 
 
-def generate_thumbnail_to_brush(image_path:str, name:str, uuid:str):
+@lru_cache(maxsize=1)
+def card_assets():
+	"""Card font and feather icon, loaded once per process."""
+	font = ImageFont.truetype(str(assets/"AlmarenaNeue-Bold.otf"), SSfontSize)
+	feather_icon = Image.open(assets/"feather.png")
+	feather_size = feather_icon.size
+	# Resize feather icon
+	SSfeather_size = (feather_size[0]*SS, feather_size[1]*SS)
+	feather_icon = feather_icon.resize(SSfeather_size, Image.LANCZOS)
+
+	# Create a mask for rounded corners
+	mask = Image.new("L", SSimg, 0)
+	draw_mask = ImageDraw.Draw(mask)
+	radius = 20*SS
+	draw_mask.rounded_rectangle((0, 0, SSimg[0], SSimg[1]), radius=radius, fill=255)
+	return font, feather_icon, mask
+
+
+def generate_thumbnail_to_brush(image_path, name:str, uuid:str, save:bool = True):
 	"""
-	load the image,
+	load the image (a path, or an already decoded PIL image),
 	resize it to `image_size`,
 	add the name as text using `Assets/AlmarenaNeue-Bold.otf` font place it at 20px,20px
 	add a png `Assets/feather.png` on top right corner
 
 	add rgb(24, 22, 25) as background color
+
+	With `save`, also writes the card to thumbnails.tmp for inspection.
 	"""
 
 	# Load image
-	img = Image.open(image_path)
-	img = img.resize(SSimg, Image.LANCZOS)
+	img = image_path if isinstance(image_path, Image.Image) else Image.open(image_path)
+	if img.size != SSimg:
+		img = img.resize(SSimg, Image.LANCZOS)
 
 	# Create background
 	background = Image.new("RGBA", img.size, ImageBGColor)
@@ -93,52 +137,76 @@ def generate_thumbnail_to_brush(image_path:str, name:str, uuid:str):
 	img = background
 	
 
+	font, feather_icon, mask = card_assets()
+
 	# Draw text
 	draw = ImageDraw.Draw(img)
-	font = ImageFont.truetype("Assets/AlmarenaNeue-Bold.otf", SSfontSize)
 	# Calculate text size
 	textX = 25*SS
 	textY = 25*SS
 	draw.text((textX, textY), name, font=font, fill=TextColor)
 
 	# Add feather icon on top right corner (no resize)
-	feather_icon = Image.open("Assets/feather.png")
-	feather_size = feather_icon.size
-	# Resize feather icon
-	SSfeather_size = (feather_size[0]*SS, feather_size[1]*SS)
-	feather_icon = feather_icon.resize(SSfeather_size, Image.LANCZOS)
-	# Paste feather icon
-	img.paste(feather_icon, (img.size[0] - SSfeather_size[0], 0), feather_icon)
+	img.paste(feather_icon, (img.size[0] - feather_icon.size[0], 0), feather_icon)
 
 	# make it rounded corners
-	# Create a mask for rounded corners
-	mask = Image.new("L", img.size, 0)
-	draw_mask = ImageDraw.Draw(mask)
-	radius = 20*SS
-	draw_mask.rounded_rectangle((0, 0, img.size[0], img.size[1]), radius=radius, fill=255)
-	# Apply the mask to the image
 	img.putalpha(mask)
-	
-	# Save thumbnail with UUID
-	uuid = uuid.replace("-", "_")
-	# Create temporary directory for thumbnails
-	os.makedirs("thumbnails.tmp", exist_ok=True)
-	# Save thumbnail
-	img.save(f"thumbnails.tmp/{name}-{uuid}.png")
+
+	if save:
+		# Save thumbnail with UUID
+		uuid = uuid.replace("-", "_")
+		# Create temporary directory for thumbnails
+		os.makedirs("thumbnails.tmp", exist_ok=True)
+		# Save thumbnail
+		img.save(f"thumbnails.tmp/{name}-{uuid}.png")
 
 
 	return img
 
 
+def render_card(task):
+	"""Pool worker: render one card and return it as an RGBA array."""
+	image, name, uuid, save = task
+	return np.asarray(generate_thumbnail_to_brush(image, name, uuid, save))
+
+
+def render_cards(images: List[Dict[str, str]], save: bool = True):
+	"""Render every brush card, in order, on a process pool for larger sets."""
+	tasks = [
+		# in-memory thumbnails when creator2 renders the video right after building the set
+		(img_info.get("image") or img_info["path"], str(idx+1), img_info["uuid"], save)
+		for idx, img_info in enumerate(images)
+	]
+	if len(tasks) <= inline_cards or card_workers == 1:
+		return [render_card(task) for task in tasks]
+	with ProcessPoolExecutor(max_workers=card_workers) as executor:
+		return list(executor.map(render_card, tasks, chunksize=max(1, len(tasks) // (card_workers * 4))))
+
+
 def progress_bar(w, h):
 	"""
 	Just a simple rounded rectangle with a color of rgb(151, 149, 152)"""
 
 
-def generate_video(images: List[Dict[str, str]], brush_name:str, output_file: str = "output.mp4"):
+def metrics_stage(name, **labels):
+	"""`instrument.stage` when instrumentation is loaded, otherwise a no-op."""
+	if instrument is None:
+		return nullcontext()
+	return instrument.stage(name, **labels)
+
+
+def children_cpu():
+	"""CPU seconds of the child processes (ffmpeg) waited for so far."""
+	times = os.times()
+	return times.children_user + times.children_system
+
+
+def build_video_clip(images: List[Dict[str, str]], brush_name:str, save_cards:bool = True):
 	"""
 	Create a composite video by stitching together all thumbnail images in a long vertical image
 	and scrolling it upward according to a segmented (looped) speed profile.
+
+	Returns the clip without rendering it, see `generate_video`.
 	"""
 	# Generate random loop durations
 	loop_times = random.randrange(6, 9)
@@ -166,7 +234,7 @@ def generate_video(images: List[Dict[str, str]], brush_name:str, output_file: st
 		# Use a nominal peak speed of 1.0 (it will be normalized later)
 		v_vals_local = np.array([graph.speed_at_time(t, d, 1.0, 5, hold_fraction=0.1) for t in t_vals_local])
 		# Use trapezoidal integration to get cumulative displacement
-		cumulative_disp_local = np_cumtrapz(v_vals_local, t_vals_local, initial=0)
+		cumulative_disp_local = np.concatenate(([0.0], np.cumsum((v_vals_local[1:] + v_vals_local[:-1]) / 2 * np.diff(t_vals_local))))
 		total_disp_local = cumulative_disp_local[-1]
 		loop_integration.append((t_vals_local, cumulative_disp_local, total_disp_local))
 	
@@ -195,15 +263,21 @@ def generate_video(images: List[Dict[str, str]], brush_name:str, output_file: st
 		return start_y + overall_fraction * (end_y - start_y)
 
 	# Create a composite image that stitches all thumbnails vertically.
-	composite_img = Image.new("RGBA", (SSscreen[0], total_list_height), (0,0,0,0))
-	for idx, img_info in enumerate(images):
-		thumb = generate_thumbnail_to_brush(img_info["path"], str(idx+1), img_info["uuid"])
-		composite_img.paste(thumb, (0, idx * (SSimg[1] + SSpaddingY)))
-	composite_np = np.array(composite_img)
+	with metrics_stage("strip build", video=brush_name, brushes=len(images)):
+		with metrics_stage("thumbnail rendering", video=brush_name, brushes=len(images)):
+			cards = render_cards(images, save_cards)
+		composite_np = np.zeros((total_list_height, SSscreen[0], 4), dtype=np.uint8)
+		for idx, card in enumerate(cards):
+			top = idx * (SSimg[1] + SSpaddingY)
+			# clip to the strip, like Image.paste does
+			height = min(card.shape[0], total_list_height - top)
+			width = min(card.shape[1], SSscreen[0])
+			if height <= 0:
+				break
+			composite_np[top:top + height, :width] = card[:height, :width]
+		del cards
 	background_clip = ImageClip(composite_np).set_duration(total_duration)
 
-	del composite_img
-	del thumb
 	del images
 
 	# Set the scrolling animation with the multi-loop position updater.
@@ -217,10 +291,10 @@ def generate_video(images: List[Dict[str, str]], brush_name:str, output_file: st
 	# ).set_duration(total_duration)
 
 	if SS != 1:
-		scrolling_clip = scrolling_clip.resize(screen_size)
+		scrolling_clip = resize(scrolling_clip, screen_size)
 
 	# Add a cover image at the beginning
-	cover_path = "Assets/MainCover.png"
+	cover_path = assets/"MainCover.png"
 	cover_img = load_cover(cover_path, brush_name)
 
 	# put the video at X=248 px, Y= 0 px on the cover
@@ -236,9 +310,26 @@ def generate_video(images: List[Dict[str, str]], brush_name:str, output_file: st
 		bg_color=OverAllBGColor
 	).set_duration(total_duration)
 
+	return finalCovered
+
+
+def generate_video(images: List[Dict[str, str]], brush_name:str, output_file: str = "output.mp4", save_cards:bool = True):
+	"""
+	Render the scrolling preview for a brushset and encode it to `output_file`.
+
+	`save_cards` also writes every brush card to thumbnails.tmp, which is only
+	useful for checking them by eye.
+	"""
+	finalCovered = build_video_clip(images, brush_name, save_cards)
 
+	measured = instrument is not None and instrument.mode
+	if measured:
+		# time frame rendering separately from the encode that drives it
+		frame_tally = instrument.Tally("frame render")
+		finalCovered.make_frame = frame_tally.wrap(finalCovered.make_frame)
+		encode_wall, encode_cpu, encode_children = time.perf_counter(), time.thread_time(), children_cpu()
 
-	temp_output = "temp_output.mp4"
+	temp_output = str(Path(output_file).with_name("temp_output.mp4"))
 	# Write the video file with high quality settings.
 	finalCovered.write_videofile(
 		temp_output,
@@ -253,6 +344,13 @@ def generate_video(images: List[Dict[str, str]], brush_name:str, output_file: st
 		]
 	)
 
+	if measured:
+		encode_wall = time.perf_counter() - encode_wall - frame_tally.wall
+		# the x264 work happens in the ffmpeg child, which moviepy has waited for by now
+		encode_cpu = time.thread_time() - encode_cpu - frame_tally.cpu + children_cpu() - encode_children
+		frame_tally.emit(video=brush_name)
+		instrument.record("encode", encode_wall, encode_cpu, video=brush_name)
+
 	try:
 		os.remove(output_file)
 	except FileNotFoundError:
@@ -264,6 +362,20 @@ def generate_video(images: List[Dict[str, str]], brush_name:str, output_file: st
 
 
 if __name__ == "__main__":
+	import argparse
+	parser = argparse.ArgumentParser(description="Render preview videos for every brushset in Brushsets.tmp")
+	parser.add_argument("--save-cards", action="store_true", help="keep every rendered brush card in thumbnails.tmp")
+	parser.add_argument("--card-workers", type=int, default=card_workers, help="processes rendering brush cards")
+	parser.add_argument("--metrics", choices=("jsonl", "table"), default=None, help="record per-stage wall time, CPU time and peak RSS")
+	parser.add_argument("--metrics-file", default=None, help="append JSON lines here instead of stdout")
+	args = parser.parse_args()
+	card_workers = args.card_workers
+	if args.metrics:
+		if instrument is None:
+			sys.path.insert(0, str(creator_dir))
+			import instrument
+		instrument.configure(args.metrics, args.metrics_file)
+
 	# Example usage
 	for f in os.scandir("Brushsets.tmp"):
 		if not f.name.endswith(".brushset"):
@@ -278,15 +390,19 @@ if __name__ == "__main__":
 		output_dir = "output.tmp"
 
 		os.makedirs(temp_dir, exist_ok=True)
-		os.makedirs(thumbnails_dir, exist_ok=True)
 		os.makedirs(output_dir, exist_ok=True)
 
 		# Extract brushset information
-		brushset_info = extract_brushes.extract_brushset_info(brushset_file, temp_dir)
+		with metrics_stage("extraction", brushset=f.name):
+			brushset_info = extract_brushes.extract_brushset_info(brushset_file, temp_dir)
 		# Generate video
-		generate_video(brushset_info["brushes"], brush_name=brushset_info["name"], output_file=f"{output_dir}/{brushset_info['name']}.mp4")
+		generate_video(brushset_info["brushes"], brush_name=brushset_info["name"], output_file=f"{output_dir}/{brushset_info['name']}.mp4", save_cards=args.save_cards)
 		# Clean up temporary files
 		import shutil
 		shutil.rmtree(temp_dir)
-		shutil.rmtree(thumbnails_dir)
+		if not args.save_cards:
+			shutil.rmtree(thumbnails_dir, ignore_errors=True)
+
+	if args.metrics:
+		instrument.report()
 
@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+"""
+Searchable catalog of every brush across a folder of .brushset files.
+
+Each brushset is read in place (extract_brushes.read_brushset_info, nothing is
+extracted to disk) and one row per brush goes into a local sqlite file: set,
+UUID, name, grain size and a 64-bit perceptual hash of Grain.png. Sets are
+hashed in a process pool, and within a set every grain is hashed in one
+batched NumPy DCT. Re-running `index` only re-reads sets whose file changed.
+
+Near-duplicate lookups use multi-index hashing: the 64-bit hash is split into
+four 16-bit bands, and any hash within distance r of the query must match one
+band to within r // 4 bits. The bands are stored as indexed columns, so `near`
+only reads the candidate rows from those indexes instead of scanning the
+catalog, which keeps it interactive at 100k brushes.
+
+	python catalog_index.py index Brushsets.tmp ../BrushSet-Creation/ProCreate_Brush/build_brush_sets.tmp
+	python catalog_index.py near --uuid F570A7D8-315F-4FB0-9969-D5F67952BE34 --radius 8
+	python catalog_index.py duplicates --radius 3
+"""
+
+import argparse
+import io
+import sqlite3
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import extract_brushes
+
+here = Path(__file__).parent
+default_db = here/"catalog.tmp.sqlite"
+
+HASH_SIZE = 8  # 8x8 low-frequency DCT coefficients -> 64 bits
+SAMPLE_SIZE = 32  # grains are shrunk to 32x32 before the DCT
+BANDS = 4
+BAND_BITS = 64 // BANDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sets (
+	path TEXT PRIMARY KEY,
+	name TEXT,
+	mtime_ns INTEGER,
+	size INTEGER
+);
+CREATE TABLE IF NOT EXISTS brushes (
+	set_path TEXT REFERENCES sets(path) ON DELETE CASCADE,
+	set_name TEXT,
+	uuid TEXT,
+	name TEXT,
+	width INTEGER,
+	height INTEGER,
+	phash INTEGER,
+	band0 INTEGER,
+	band1 INTEGER,
+	band2 INTEGER,
+	band3 INTEGER,
+	PRIMARY KEY (set_path, uuid)
+);
+CREATE INDEX IF NOT EXISTS brushes_uuid ON brushes(uuid);
+CREATE INDEX IF NOT EXISTS brushes_name ON brushes(name);
+CREATE INDEX IF NOT EXISTS brushes_band0 ON brushes(band0);
+CREATE INDEX IF NOT EXISTS brushes_band1 ON brushes(band1);
+CREATE INDEX IF NOT EXISTS brushes_band2 ON brushes(band2);
+CREATE INDEX IF NOT EXISTS brushes_band3 ON brushes(band3);
+"""
+
+# values per `IN (...)`, below SQLite's oldest host parameter limit of 999
+IN_BATCH = 500
+
+
+@lru_cache(maxsize=None)
+def dct_matrix(n=SAMPLE_SIZE):
+	"""Orthonormal DCT-II matrix, so `D @ x @ D.T` is the 2D DCT of x."""
+	k = np.arange(n)[:, None]
+	i = np.arange(n)[None, :]
+	matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+	matrix[0] /= np.sqrt(2)
+	return matrix.astype(np.float32)
+
+
+def grain_sample(data):
+	"""Decode Grain.png bytes to (original size, SAMPLE_SIZE x SAMPLE_SIZE float array)."""
+	img = Image.open(io.BytesIO(data))
+	size = img.size
+	# shrink by an integer factor first, the BOX resize then only sees ~64px
+	factor = min(size) // (SAMPLE_SIZE * 2)
+	if factor > 1:
+		img = img.reduce(factor)
+	img = img.convert("L").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.BOX)
+	return size, np.asarray(img, dtype=np.float32)
+
+
+def phash_batch(samples):
+	"""64-bit DCT perceptual hashes of a stack of samples, shape (n, 32, 32)."""
+	dct = dct_matrix()
+	coeffs = dct @ samples @ dct.T
+	low = coeffs[:, :HASH_SIZE, :HASH_SIZE].reshape(len(samples), -1)
+	bits = low > np.median(low, axis=1, keepdims=True)
+	packed = np.packbits(bits, axis=1)
+	return [int(h) for h in packed.view(">u8").ravel()]
+
+
+def phash_image(path):
+	"""Perceptual hash of an image file, for querying with an arbitrary texture."""
+	_, sample = grain_sample(Path(path).read_bytes())
+	return phash_batch(sample[None])[0]
+
+
+def to_signed(h):
+	"""sqlite integers are signed 64-bit."""
+	return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def to_unsigned(h):
+	return h + (1 << 64) if h < 0 else h
+
+
+def hash_bands(h):
+	"""The BANDS 16-bit bands of an unsigned 64-bit hash, lowest first."""
+	mask = (1 << BAND_BITS) - 1
+	return [(h >> band * BAND_BITS) & mask for band in range(BANDS)]
+
+
+def hash_brushset(path):
+	"""Read one brushset in place and return (path, set name, rows), or (path, None, error)."""
+	try:
+		with zipfile.ZipFile(path) as zip_ref:
+			info = extract_brushes.read_brushset_info(zip_ref)
+			rows, samples = [], []
+			for brush in info["brushes"]:
+				if "grain" not in brush:
+					continue
+				name = None
+				if "archive" in brush:
+					try:
+						name = extract_brushes.brush_name(zip_ref.read(brush["archive"]))
+					except Exception:
+						pass  # an unreadable archive still gets a row, without a name
+				(width, height), sample = grain_sample(zip_ref.read(brush["grain"]))
+				rows.append((brush["uuid"], name, width, height))
+				samples.append(sample)
+	except Exception as e:
+		return str(path), None, f"{type(e).__name__}: {e}"
+
+	hashes = phash_batch(np.stack(samples)) if samples else []
+	return str(path), info["name"], [row + (h,) for row, h in zip(rows, hashes)]
+
+
+def find_brushsets(paths):
+	for path in map(Path, paths):
+		if path.is_dir():
+			yield from sorted(path.rglob("*.brushset"))
+		else:
+			yield path
+
+
+def connect(db_path=default_db):
+	conn = sqlite3.connect(db_path)
+	conn.execute("PRAGMA foreign_keys = ON")
+	conn.executescript(SCHEMA)
+	return conn
+
+
+def index(conn, paths, workers=None):
+	"""Add or refresh every brushset under `paths`; unchanged files are skipped."""
+	known = {path: (mtime, size) for path, mtime, size in conn.execute("SELECT path, mtime_ns, size FROM sets")}
+	stale, stats = [], {}
+	for path in find_brushsets(paths):
+		path = str(path.resolve())
+		stat = Path(path).stat()
+		stats[path] = (stat.st_mtime_ns, stat.st_size)
+		if known.get(path) != stats[path]:
+			stale.append(path)
+	print(f"{len(stale)} of {len(stats)} brushsets changed since the last index")
+
+	indexed = brushes = 0
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		for path, set_name, rows in executor.map(hash_brushset, stale):
+			if set_name is None:
+				print(f"Skipping {path}: {rows}")
+				continue
+			with conn:
+				conn.execute("DELETE FROM sets WHERE path = ?", (path,))
+				conn.execute("INSERT INTO sets VALUES (?, ?, ?, ?)", (path, set_name, *stats[path]))
+				conn.executemany(
+					"INSERT OR REPLACE INTO brushes (set_path, set_name, uuid, name, width, height, phash, band0, band1, band2, band3)"
+					" VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+					[(path, set_name, uid, name, w, h, to_signed(ph), *hash_bands(ph)) for uid, name, w, h, ph in rows],
+				)
+			indexed += 1
+			brushes += len(rows)
+	return indexed, brushes
+
+
+def prune(conn):
+	"""Drop sets whose file no longer exists."""
+	gone = [path for (path,) in conn.execute("SELECT path FROM sets") if not Path(path).exists()]
+	with conn:
+		conn.executemany("DELETE FROM sets WHERE path = ?", [(p,) for p in gone])
+	return len(gone)
+
+
+@lru_cache(maxsize=None)
+def flip_masks(flips, bits=BAND_BITS):
+	"""Every mask of at most `flips` set bits within one band."""
+	masks = [0]
+	for count in range(1, flips + 1):
+		for positions in combinations(range(bits), count):
+			masks.append(sum(1 << p for p in positions))
+	return masks
+
+
+class HashIndex:
+	"""Multi-index hashing over 64-bit hashes for Hamming-radius queries."""
+
+	def __init__(self, hashes):
+		self.hashes = hashes
+		self.tables = [defaultdict(list) for _ in range(BANDS)]
+		for i, h in enumerate(hashes):
+			for table, value in zip(self.tables, hash_bands(h)):
+				table[value].append(i)
+
+	def search(self, query, radius):
+		"""Indices of hashes within `radius` bits of `query`, nearest first, as (index, distance)."""
+		candidates = set()
+		for table, value in zip(self.tables, hash_bands(query)):
+			for flip in flip_masks(radius // BANDS):
+				candidates.update(table.get(value ^ flip, ()))
+		hits = [(i, (self.hashes[i] ^ query).bit_count()) for i in candidates]
+		return sorted((hit for hit in hits if hit[1] <= radius), key=lambda hit: hit[1])
+
+
+def load_index(conn):
+	"""Rows of every indexed brush plus a HashIndex over their hashes."""
+	rows = conn.execute("SELECT set_name, uuid, name, width, height, phash FROM brushes").fetchall()
+	return rows, HashIndex([to_unsigned(row[5]) for row in rows])
+
+
+def near(conn, query, radius=8, limit=20):
+	"""Brushes whose grain hash is within `radius` bits of `query`, read through the band indexes."""
+	candidates = {}
+	for band, value in enumerate(hash_bands(query)):
+		values = [value ^ flip for flip in flip_masks(radius // BANDS)]
+		for i in range(0, len(values), IN_BATCH):
+			batch = values[i:i + IN_BATCH]
+			for rowid, *row in conn.execute(
+				f"SELECT rowid, set_name, uuid, name, width, height, phash FROM brushes WHERE band{band} IN ({', '.join('?' * len(batch))})",
+				batch,
+			):
+				candidates[rowid] = tuple(row)
+	hits = [(row, (to_unsigned(row[5]) ^ query).bit_count()) for row in candidates.values()]
+	return sorted((hit for hit in hits if hit[1] <= radius), key=lambda hit: hit[1])[:limit]
+
+
+def duplicate_groups(conn, radius=3):
+	"""Groups of brushes whose grains are within `radius` bits of each other (transitively)."""
+	rows, hash_index = load_index(conn)
+	parent = list(range(len(rows)))
+
+	def root(i):
+		while parent[i] != i:
+			parent[i] = parent[parent[i]]
+			i = parent[i]
+		return i
+
+	for i, h in enumerate(hash_index.hashes):
+		for j, _ in hash_index.search(h, radius):
+			if j > i:
+				parent[root(j)] = root(i)
+
+	groups = defaultdict(list)
+	for i in range(len(rows)):
+		groups[root(i)].append(rows[i])
+	return sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+
+def describe(row):
+	set_name, uid, name, width, height, _ = row
+	return f"{set_name} / {name or '?'} ({uid}, {width}x{height})"
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Index brushsets and find near-duplicate grains")
+	parser.add_argument("--db", type=Path, default=default_db)
+	sub = parser.add_subparsers(dest="command", required=True)
+
+	index_parser = sub.add_parser("index", help="add or refresh brushsets in the catalog")
+	index_parser.add_argument("paths", nargs="+", help=".brushset files or folders containing them")
+	index_parser.add_argument("--workers", type=int, default=None)
+
+	near_parser = sub.add_parser("near", help="brushes with a grain similar to a given one")
+	query = near_parser.add_mutually_exclusive_group(required=True)
+	query.add_argument("--uuid", help="a brush already in the catalog")
+	query.add_argument("--image", help="any image file")
+	query.add_argument("--hash", help="a 64-bit hash in hex")
+	near_parser.add_argument("--radius", type=int, default=8, help="maximum Hamming distance in bits")
+	near_parser.add_argument("--limit", type=int, default=20)
+
+	dup_parser = sub.add_parser("duplicates", help="list groups of near-identical grains")
+	dup_parser.add_argument("--radius", type=int, default=3, help="maximum Hamming distance in bits (up to 3 needs only exact band matches)")
+	args = parser.parse_args()
+
+	start = time.time()
+	conn = connect(args.db)
+
+	if args.command == "index":
+		indexed, brushes = index(conn, args.paths, args.workers)
+		removed = prune(conn)
+		total = conn.execute("SELECT COUNT(*) FROM brushes").fetchone()[0]
+		print(f"Indexed {brushes} brushes from {indexed} brushsets ({removed} missing sets dropped), {total} brushes in {args.db}")
+
+	elif args.command == "near":
+		if args.uuid:
+			row = conn.execute("SELECT phash FROM brushes WHERE uuid = ?", (args.uuid.upper(),)).fetchone()
+			if row is None:
+				parser.error(f"{args.uuid} is not in the catalog")
+			query_hash = to_unsigned(row[0])
+		elif args.image:
+			query_hash = phash_image(args.image)
+		else:
+			query_hash = int(args.hash, 16)
+		print(f"Query hash {query_hash:016x}")
+		for row, distance in near(conn, query_hash, args.radius, args.limit):
+			print(f"{distance:>3}  {describe(row)}")
+
+	else:
+		groups = duplicate_groups(conn, args.radius)
+		for group in groups:
+			print(f"\n{len(group)} near-identical grains:")
+			for row in group:
+				print(f"  {describe(row)}")
+		print(f"\n{len(groups)} groups, {sum(len(g) for g in groups)} brushes")
+
+	print(f"Time taken: {time.time()-start:.2f} seconds")
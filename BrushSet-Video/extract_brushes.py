@@ -34,6 +34,7 @@ def extract_brushset_info(brushset_file: str, temp_dir: str):
 	
 	with zipfile.ZipFile(brushset_file, 'r') as zip_ref:
 		zip_ref.extractall(temp_path)
+		members = {name.lower(): name for name in zip_ref.namelist()}
 	
 	plist_path = temp_path / 'brushset.plist'
 	if not plist_path.exists():
@@ -45,23 +46,68 @@ def extract_brushset_info(brushset_file: str, temp_dir: str):
 	brushset_name = plist_data.get('name', 'Unknown')
 	brush_uuids = plist_data.get('brushes', [])
 
-	def thumbnail(path: Path):
-		return path/"QuickLook"/"thumbnail.png"
+	def thumbnail(uuid: str):
+		# the member is QuickLook/Thumbnail.png, match it as stored so this works on case-sensitive filesystems
+		member = f"{uuid}/QuickLook/Thumbnail.png"
+		return temp_path / members.get(member.lower(), member)
 	
 	brushes = [
 		{"uuid": uuid, 
 		"brush_path": str(temp_path / uuid),
-		"thumbnail": str(thumbnail(temp_path / uuid)),
-		"path": str(thumbnail(temp_path / uuid))}
+		"thumbnail": str(thumbnail(uuid)),
+		"path": str(thumbnail(uuid))}
 		for uuid in brush_uuids
 	]
 	
 	return {"name": brushset_name, "brushes": brushes}
 
+
+def brush_name(archive: bytes):
+	"""Name of the brush stored in Brush.archive bytes (an NSKeyedArchiver plist)."""
+	def index(ref):
+		# binary archives hold UIDs, XML ones {"CF$UID": n}
+		return ref.data if isinstance(ref, plistlib.UID) else ref["CF$UID"]
+
+	data = plistlib.loads(archive)
+	objects = data["$objects"]
+	name = objects[index(data["$top"]["root"])].get("name")
+	return name if isinstance(name, str) or name is None else objects[index(name)]
+
+
+def read_brushset_info(zip_ref: zipfile.ZipFile):
+	"""
+	Like extract_brushset_info, but reads an open brushset in place without
+	extracting anything.
+
+	Returns:
+		dict: 'name' and 'brushes' (list of dicts with 'uuid' and the 'grain',
+		'archive' and 'thumbnail' member names, for the ones present).
+	"""
+	plist_data = plistlib.loads(zip_ref.read('brushset.plist'))
+	names = set(zip_ref.namelist())
+
+	brushes = []
+	for uuid in plist_data.get('brushes', []):
+		brush = {"uuid": uuid}
+		for key, member in (("archive", "Brush.archive"), ("grain", "Grain.png"), ("thumbnail", "QuickLook/Thumbnail.png")):
+			if f"{uuid}/{member}" in names:
+				brush[key] = f"{uuid}/{member}"
+		brushes.append(brush)
+
+	return {"name": plist_data.get('name', 'Unknown'), "brushes": brushes}
+
 if __name__ == "__main__":
-	# Example usage
-	brushset_file = "Assets/Brick Wall.tmp.brushset"
-	temp_dir = "Temp.tmp"
-	
-	result = extract_brushset_info(brushset_file, temp_dir)
-	print(result)
+	import argparse
+	import json
+	parser = argparse.ArgumentParser(description="Print the name and brush UUIDs of a .brushset")
+	parser.add_argument("brushset_file", nargs="?", default="Assets/Brick Wall.tmp.brushset")
+	parser.add_argument("--temp-dir", default="Temp.tmp", help="where to extract the brushset")
+	parser.add_argument("--list", action="store_true", help="only read the brushset, don't extract it")
+	args = parser.parse_args()
+
+	if args.list:
+		with zipfile.ZipFile(args.brushset_file) as zip_ref:
+			result = read_brushset_info(zip_ref)
+	else:
+		result = extract_brushset_info(args.brushset_file, args.temp_dir)
+	print(json.dumps(result, indent=1))
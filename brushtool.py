@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+One entry point for the brush creation and preview scripts.
+
+	python brushtool.py build [--grain-max-edge 2048 ...]   BrushSet-Creation/ProCreate_Brush/creator2.py
+	python brushtool.py set merge A.brushset B.brushset -o C.brushset
+	python brushtool.py video                               BrushSet-Video/app.py
+	python brushtool.py check                               brushset/video inventory of the current folder
+	python brushtool.py extract X.brushset --list
+	python brushtool.py validate build_brush_sets.tmp
+
+Everything after the subcommand goes to the script, so `brushtool.py build
+--help` shows creator2's own options. This file only imports the standard
+library; each script is loaded when its subcommand runs, so `check`,
+`extract` and `validate` never import NumPy, PIL or moviepy.
+
+	python brushtool.py importtime            # measure start-up of every subcommand
+	python brushtool.py importtime --check    # exit 1 when one is over its budget or can't start
+"""
+
+import argparse
+import os
+import re
+import runpy
+import sys
+from pathlib import Path
+
+here = Path(__file__).resolve().parent
+creation = here/"BrushSet-Creation"/"ProCreate_Brush"
+video = here/"BrushSet-Video"
+
+# name -> (script, run it from its own folder, help)
+COMMANDS = {
+	"build": (creation/"creator2.py", False, "build brushes and brush sets from Samples.tmp"),
+	"set": (creation/"curate_brushset.py", False, "merge, split or subset brushsets"),
+	"video": (video/"app.py", True, "render preview videos for Brushsets.tmp"),
+	"check": (video/"Brushsets.tmp"/"code"/"check.py", False, "report which brushsets in this folder have videos"),
+	"extract": (video/"extract_brushes.py", False, "print a brushset's name and brush UUIDs"),
+	"validate": (creation/"validate_brushset.py", False, "validate .brush/.brushset files"),
+}
+
+# start-up budget per subcommand: total `-X importtime` of `brushtool.py <command> --help`, in ms.
+# The standard-library-only commands measure ~50ms; NumPy alone would put them over.
+IMPORT_BUDGET_MS = {
+	"build": 400,
+	"set": 400,
+	"video": 1500,
+	"check": 80,
+	"extract": 80,
+	"validate": 80,
+}
+
+
+def run_command(name, argv):
+	"""Run a subcommand's script as __main__ with `argv`, importing only what it imports."""
+	script, own_folder, _ = COMMANDS[name]
+	sys.argv = [str(script), *argv]
+	sys.path.insert(0, str(script.parent))
+	if own_folder:
+		os.chdir(script.parent)
+	runpy.run_path(str(script), run_name="__main__")
+
+
+# optional dependency per subcommand: when it isn't installed the command is
+# reported as skipped instead of failing `importtime --check`
+OPTIONAL_DEPENDENCIES = {
+	"video": "moviepy",
+}
+
+
+def import_time_ms(name):
+	"""Total import time of starting `name` (up to its --help), or None when it can't start here."""
+	import subprocess
+	result = subprocess.run(
+		[sys.executable, "-X", "importtime", __file__, name, "--help"],
+		capture_output=True, text=True,
+	)
+	if result.returncode != 0:
+		return None, result.stderr.strip().splitlines()[-1]
+	# lines look like "import time:       123 |        456 | package"; sum the self times
+	self_us = [int(m.group(1)) for m in re.finditer(r"^import time:\s+(\d+) \|", result.stderr, re.M)]
+	return sum(self_us) / 1000, None
+
+
+def missing_optional_dependency(name, error):
+	"""Whether `error` is only the subcommand's optional dependency not being installed."""
+	dependency = OPTIONAL_DEPENDENCIES.get(name)
+	return dependency is not None and error == f"ModuleNotFoundError: No module named '{dependency}'"
+
+
+def check_import_times(names, enforce=False):
+	over = []
+	print(f"{'command':<10} {'import ms':>10} {'budget ms':>10}")
+	for name in names:
+		ms, error = import_time_ms(name)
+		budget = IMPORT_BUDGET_MS[name]
+		if ms is None:
+			if missing_optional_dependency(name, error):
+				print(f"{name:<10} {'-':>10} {budget:>10}  skipped, {OPTIONAL_DEPENDENCIES[name]} isn't installed")
+				continue
+			print(f"{name:<10} {'-':>10} {budget:>10}  FAILED to start: {error}")
+			over.append(name)
+			continue
+		flag = ""
+		if ms > budget:
+			flag = "  OVER BUDGET"
+			over.append(name)
+		print(f"{name:<10} {ms:>10.1f} {budget:>10}{flag}")
+	if enforce and over:
+		sys.exit(f"{len(over)} subcommand(s) over their import budget or failing to start: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+	# hand everything after the subcommand to its script untouched, --help included
+	if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+		run_command(sys.argv[1], sys.argv[2:])
+		sys.exit()
+
+	parser = argparse.ArgumentParser(description="Procreate brush tools", epilog="Run `brushtool.py <command> --help` for a command's options.")
+	sub = parser.add_subparsers(dest="command", required=True)
+	for name, (_, _, help_text) in COMMANDS.items():
+		sub.add_parser(name, help=help_text)
+	importtime_parser = sub.add_parser("importtime", help="measure (or --check) start-up import time per subcommand")
+	importtime_parser.add_argument("commands", nargs="*", metavar="command", help="subcommands to measure (default: all)")
+	importtime_parser.add_argument("--check", action="store_true", help="exit 1 when a subcommand is over its budget or fails to start")
+	args = parser.parse_args()
+
+	unknown = set(args.commands) - set(COMMANDS)
+	if unknown:
+		parser.error(f"unknown command(s): {', '.join(sorted(unknown))}")
+	check_import_times(args.commands or list(COMMANDS), args.check)
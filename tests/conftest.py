@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+
+# the scripts import their neighbours by flat module name, as when run from their folder
+for folder in (root/"BrushSet-Creation"/"ProCreate_Brush", root/"BrushSet-Video"):
+	if str(folder) not in sys.path:
+		sys.path.insert(0, str(folder))
@@ -0,0 +1,27 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+spec = importlib.util.spec_from_file_location("brushtool", Path(__file__).resolve().parent.parent/"brushtool.py")
+brushtool = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(brushtool)
+
+
+@pytest.mark.parametrize("name", list(brushtool.COMMANDS))
+def test_import_time_within_budget(name, tmp_path, monkeypatch):
+	if name in brushtool.OPTIONAL_DEPENDENCIES:
+		pytest.importorskip(brushtool.OPTIONAL_DEPENDENCIES[name])
+	# `--help` must not do any work, e.g. check.py writing its report
+	monkeypatch.chdir(tmp_path)
+	# the first run may still be compiling bytecode
+	runs = [brushtool.import_time_ms(name) for _ in range(2)]
+	assert all(error is None for _, error in runs), runs
+	assert min(ms for ms, _ in runs) <= brushtool.IMPORT_BUDGET_MS[name]
+	assert list(tmp_path.iterdir()) == []
+
+
+def test_unexplained_start_failure_is_not_skipped():
+	assert brushtool.missing_optional_dependency("video", "ModuleNotFoundError: No module named 'moviepy'")
+	assert not brushtool.missing_optional_dependency("video", "ModuleNotFoundError: No module named 'PIL'")
+	assert not brushtool.missing_optional_dependency("build", "ModuleNotFoundError: No module named 'moviepy'")
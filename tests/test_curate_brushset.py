@@ -0,0 +1,121 @@
+import argparse
+import plistlib
+import zipfile
+
+import pytest
+
+import curate_brushset
+import validate_brushset
+
+
+def archive(name):
+	"""A minimal NSKeyedArchiver Brush.archive carrying `name`."""
+	return plistlib.dumps({
+		"$archiver": "NSKeyedArchiver",
+		"$top": {"root": plistlib.UID(1)},
+		"$objects": ["$null", {"name": plistlib.UID(2)}, name],
+	}, fmt=plistlib.FMT_BINARY)
+
+
+def brush_members(name):
+	return {
+		"Brush.archive": archive(name),
+		"Grain.png": validate_brushset.PNG_MAGIC + name.encode() * 16,
+		"QuickLook/Thumbnail.png": validate_brushset.PNG_MAGIC + b"\0" * 32,
+	}
+
+
+def write_brushset(path, set_name, brushes):
+	"""Write a .brushset from {uuid: brush name}."""
+	with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+		zf.writestr("brushset.plist", plistlib.dumps({"name": set_name, "brushes": list(brushes)}))
+		for uid, name in brushes.items():
+			for member, data in brush_members(name).items():
+				zf.writestr(f"{uid}/{member}", data)
+	return path
+
+
+def uuid(n):
+	return f"00000000-0000-4000-8000-{n:012d}"
+
+
+@pytest.fixture
+def sets(tmp_path):
+	a = write_brushset(tmp_path/"A.brushset", "A", {uuid(1): "Brick Red", uuid(2): "Brick Grey", uuid(3): "Chalk"})
+	b = write_brushset(tmp_path/"B.brushset", "B", {uuid(3): "Chalk", uuid(4): "Charcoal"})
+	return a, b
+
+
+def manifest(path):
+	with zipfile.ZipFile(path) as zf:
+		return plistlib.loads(zf.read("brushset.plist"))
+
+
+def names(path):
+	with zipfile.ZipFile(path) as zf:
+		return [curate_brushset.brush_name(zf.read(f"{uid}/Brush.archive")) for uid in manifest(path)["brushes"]]
+
+
+def test_parse_index_spec():
+	assert curate_brushset.parse_index_spec("1,4-6") == {1, 4, 5, 6}
+	assert curate_brushset.parse_index_spec(" 3 ,2-2") == {2, 3}
+	for bad in ("0", "3-1", "a", "1-b", ""):
+		with pytest.raises(argparse.ArgumentTypeError):
+			curate_brushset.parse_index_spec(bad)
+
+
+def test_merge_collision_is_an_error_by_default(sets, tmp_path):
+	output = tmp_path/"out.brushset"
+	with pytest.raises(ValueError, match=uuid(3)):
+		curate_brushset.merge(sets, output)
+	assert not output.exists()
+	assert not list(tmp_path.glob("*.part"))
+
+
+def test_merge_collision_skip_keeps_the_first(sets, tmp_path):
+	output = tmp_path/"out.brushset"
+	written = curate_brushset.merge(sets, output, on_collision="skip")
+	assert written == [uuid(1), uuid(2), uuid(3), uuid(4)]
+	assert manifest(output) == {"brushes": written, "name": "out"}
+	assert names(output) == ["Brick Red", "Brick Grey", "Chalk", "Charcoal"]
+	assert validate_brushset.validate(output, deep=True)["errors"] == []
+
+
+def test_merge_collision_reassign_keeps_both(sets, tmp_path):
+	output = tmp_path/"out.brushset"
+	written = curate_brushset.merge(sets, output, set_name="Both", on_collision="reassign")
+	assert len(written) == len(set(written)) == 5
+	assert written[:3] == [uuid(1), uuid(2), uuid(3)] and written[4] == uuid(4)
+	assert validate_brushset.UUID_RE.fullmatch(written[3])
+	assert manifest(output)["name"] == "Both"
+	assert names(output) == ["Brick Red", "Brick Grey", "Chalk", "Chalk", "Charcoal"]
+	# the reassigned copy carries the same members under its new folder
+	with zipfile.ZipFile(output) as zf:
+		assert zf.testzip() is None
+		assert zf.read(f"{written[3]}/Grain.png") == zf.read(f"{uuid(3)}/Grain.png")
+
+
+def test_subset_by_name_and_position(sets, tmp_path):
+	output = tmp_path/"picks.brushset"
+	written = curate_brushset.merge(sets, output, names=["brick*"], positions={5})
+	assert written == [uuid(1), uuid(2), uuid(4)]
+	with pytest.raises(ValueError, match="No brushes matched"):
+		curate_brushset.merge(sets, tmp_path/"none.brushset", uuids=["missing"])
+
+
+def test_plain_brush_gets_a_fresh_uuid(sets, tmp_path):
+	brush = tmp_path/"single.brush"
+	with zipfile.ZipFile(brush, "w") as zf:
+		for member, data in brush_members("Loose").items():
+			zf.writestr(member, data)
+	written = curate_brushset.merge([sets[1], brush], tmp_path/"out.brushset")
+	assert written[:2] == [uuid(3), uuid(4)] and len(written) == 3
+	assert validate_brushset.UUID_RE.fullmatch(written[2])
+	assert names(tmp_path/"out.brushset")[-1] == "Loose"
+
+
+def test_split_into_parts(sets, tmp_path):
+	outputs = curate_brushset.split(sets[0], 2, tmp_path/"parts")
+	assert [p.name for p in outputs] == ["A 1.brushset", "A 2.brushset"]
+	assert [manifest(p)["brushes"] for p in outputs] == [[uuid(1), uuid(2)], [uuid(3)]]
+	assert manifest(outputs[1])["name"] == "A 2"
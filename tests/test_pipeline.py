@@ -0,0 +1,71 @@
+import threading
+
+from pipeline import Pipeline, Stage
+
+
+def run_with_timeout(pipeline, items, timeout=10):
+	"""Run the pipeline on a thread so a hang fails the test instead of the run."""
+	outcome = {}
+
+	def target():
+		try:
+			outcome["results"] = pipeline.run(items)
+		except Exception as e:
+			outcome["error"] = e
+
+	thread = threading.Thread(target=target, daemon=True)
+	thread.start()
+	thread.join(timeout)
+	assert not thread.is_alive(), "pipeline hung"
+	return outcome
+
+
+def stages():
+	return [Stage("double", lambda x: x * 2, workers=2, maxsize=1), Stage("inc", lambda x: x + 1, workers=3, maxsize=1)]
+
+
+def test_runs_items_through_every_stage():
+	exits = []
+	pipeline = Pipeline(stages(), on_exit=lambda item, error: exits.append((item, error)))
+	outcome = run_with_timeout(pipeline, range(20))
+	assert sorted(outcome["results"]) == [2 * i + 1 for i in range(20)]
+	assert sorted(exits) == [(2 * i + 1, None) for i in range(20)]
+
+
+def test_failing_items_iterator_finishes_fed_items_and_raises():
+	exits = []
+
+	def items():
+		yield from range(5)
+		raise OSError("source folder vanished")
+
+	pipeline = Pipeline(stages(), on_exit=lambda item, error: exits.append(item))
+	outcome = run_with_timeout(pipeline, items())
+	assert isinstance(outcome["error"], OSError)
+	assert sorted(exits) == [2 * i + 1 for i in range(5)]
+
+
+def test_failing_on_exit_does_not_hang_or_lose_items(capsys):
+	def on_exit(item, error):
+		if item % 3 == 0:
+			raise RuntimeError("release failed")
+
+	pipeline = Pipeline(stages(), on_exit=on_exit)
+	outcome = run_with_timeout(pipeline, range(30))
+	assert sorted(outcome["results"]) == [2 * i + 1 for i in range(30)]
+	assert "Pipeline on_exit failed" in capsys.readouterr().out
+
+
+def test_stage_errors_reach_on_exit():
+	exits = []
+
+	def picky(x):
+		if x == 4:
+			raise ValueError("bad item")
+		return x
+
+	pipeline = Pipeline([Stage("picky", picky, workers=2)], on_exit=lambda item, error: exits.append((item, type(error).__name__ if error else None)))
+	outcome = run_with_timeout(pipeline, range(6))
+	assert sorted(outcome["results"]) == [0, 1, 2, 3, 5]
+	assert (4, "ValueError") in exits
+	assert pipeline.stages[0].errors == 1
@@ -0,0 +1,89 @@
+import os
+import zipfile
+
+import rawzip
+
+GRAIN = bytes(range(256)) * 64
+NOISE = os.urandom(4096)
+
+
+def write_source(path):
+	with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+		zf.writestr("Brush.archive", b"bplist00" + b"\0" * 64)
+		zf.writestr("Grain.png", GRAIN)
+		zf.writestr("Signature/", b"")
+		zf.writestr("Signature/ünicode.png", NOISE)
+	return path
+
+
+def test_written_archive_passes_testzip(tmp_path):
+	path = tmp_path/"out.brush"
+	with rawzip.RawZipWriter(path) as writer:
+		writer.write_dir("QuickLook/")
+		writer.write_bytes("QuickLook/Thumbnail.png", GRAIN)
+		writer.write_bytes("Noise.bin", NOISE)
+		assert "Noise.bin" in writer
+
+	assert not list(tmp_path.glob("*.part"))
+	with zipfile.ZipFile(path) as zf:
+		assert zf.testzip() is None
+		assert zf.namelist() == ["QuickLook/", "QuickLook/Thumbnail.png", "Noise.bin"]
+		assert zf.getinfo("QuickLook/Thumbnail.png").compress_type == zipfile.ZIP_DEFLATED
+		# incompressible bytes are stored rather than grown by deflate
+		assert zf.getinfo("Noise.bin").compress_type == zipfile.ZIP_STORED
+		assert zf.read("Noise.bin") == NOISE
+
+
+def test_raw_members_copy_unchanged(tmp_path):
+	source = write_source(tmp_path/"source.brush")
+	copy = tmp_path/"copy.brush"
+	with rawzip.RawZipWriter(copy) as writer:
+		for member in rawzip.iter_raw_members(source):
+			writer.write_raw(member, "renamed/" + member.name if member.name == "Grain.png" else None)
+
+	with zipfile.ZipFile(source) as original, zipfile.ZipFile(copy) as zf:
+		assert zf.testzip() is None
+		for info in original.infolist():
+			name = "renamed/Grain.png" if info.filename == "Grain.png" else info.filename
+			copied = zf.getinfo(name)
+			assert (copied.CRC, copied.compress_size, copied.compress_type) == (info.CRC, info.compress_size, info.compress_type)
+			assert rawzip.read_raw(zf, copied).data == rawzip.read_raw(original, info).data
+			assert zf.read(name) == original.read(info)
+
+
+def test_duplicate_member_is_rejected_and_nothing_is_left_behind(tmp_path):
+	path = tmp_path/"out.brush"
+	try:
+		with rawzip.RawZipWriter(path) as writer:
+			writer.write_bytes("Grain.png", GRAIN)
+			writer.write_bytes("Grain.png", GRAIN)
+	except ValueError:
+		pass
+	else:
+		raise AssertionError("duplicate member was accepted")
+	assert not list(tmp_path.iterdir())
+
+
+def test_deflate_cache_hits_and_evicts():
+	cache = rawzip.DeflateCache()
+	first = cache.compress(GRAIN)
+	assert cache.compress(GRAIN) == first
+	assert (cache.hits, cache.misses) == (1, 1)
+	assert cache.report()["bytes_reused"] == len(first[2])
+
+	small = rawzip.DeflateCache(max_bytes=len(first[2]) + 1)
+	small.compress(GRAIN)
+	small.compress(GRAIN[::-1])
+	assert small.size <= small.max_bytes
+	# the older payload was evicted, so compressing it again is a miss
+	small.compress(GRAIN)
+	assert (small.hits, small.misses) == (0, 3)
+
+
+def test_find_brush_files_expands_directories(tmp_path):
+	for name in ("b/2.brush", "a.brushset", "b/notes.txt", "b/c/1.brush"):
+		(tmp_path/name).parent.mkdir(parents=True, exist_ok=True)
+		(tmp_path/name).write_bytes(b"")
+	single = tmp_path/"b"/"notes.txt"
+	found = list(rawzip.find_brush_files([tmp_path, single]))
+	assert found == [tmp_path/"a.brushset", tmp_path/"b"/"2.brush", tmp_path/"b"/"c"/"1.brush", single]
@@ -0,0 +1,119 @@
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+import svg_raster
+
+# a few real patterns: with and without colour variants
+samples = sorted(svg_raster.svgdir.glob("*.svg"))[:12:3]
+
+calls = []
+
+
+def render_stub(svg_bytes, size):
+	"""Black ink over the left half, transparent right half."""
+	calls.append(size)
+	rgba = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+	rgba[:, :size[0] // 2, 3] = 255
+	return rgba
+
+
+@pytest.fixture
+def stub_backend(tmp_path, monkeypatch):
+	svg_raster.register_backend("stub")(render_stub)
+	monkeypatch.setattr(svg_raster, "cachedir", tmp_path/"cache")
+	calls.clear()
+	yield "stub"
+	del svg_raster.BACKENDS["stub"]
+
+
+def declared_ratio(svg_bytes):
+	root = ET.fromstring(svg_bytes)
+	if "viewBox" in root.attrib:
+		_, _, width, height = (float(v) for v in re.split(r"[\s,]+", root.attrib["viewBox"].strip()))
+	else:
+		width, height = (float(re.match(r"[\d.]+", root.attrib[k]).group()) for k in ("width", "height"))
+	return width / height
+
+
+@pytest.mark.parametrize("path", samples, ids=lambda p: p.name)
+def test_svg_size_keeps_aspect_and_longest_edge(path):
+	svg_bytes = path.read_bytes()
+	for max_edge in (256, 1024):
+		width, height = svg_raster.svg_size(svg_bytes, max_edge)
+		assert max(width, height) == max_edge
+		assert width / height == pytest.approx(declared_ratio(svg_bytes), rel=0.01)
+
+
+def test_rgba_to_grain_makes_ink_white():
+	rgba = np.array([[
+		[0, 0, 0, 255],  # opaque ink
+		[255, 255, 255, 255],  # opaque paper
+		[0, 0, 0, 0],  # transparent
+		[0, 0, 0, 128],  # half-covered ink
+	]], dtype=np.uint8)
+	grain = svg_raster.rgba_to_grain(rgba)
+	assert grain.dtype == np.uint8
+	assert grain.tolist()[0][:3] == [255, 0, 0]
+	assert grain[0, 3] == pytest.approx(128, abs=1)
+
+
+def test_rasterize_caches_by_content_size_and_backend(stub_backend, tmp_path):
+	path = samples[0]
+	grain = svg_raster.rasterize(path, 128, stub_backend)
+	assert max(grain.shape) == 128
+	assert (grain[:, :grain.shape[1] // 2] == 255).all()
+	assert (grain[:, grain.shape[1] // 2 + 1:] == 0).all()
+
+	cached = svg_raster.cache_path(path.read_bytes(), 128, stub_backend)
+	assert cached.exists()
+	assert np.array_equal(svg_raster.rasterize(path, 128, stub_backend), grain)
+	assert len(calls) == 1
+
+	svg_raster.rasterize(path, 64, stub_backend)
+	assert len(calls) == 2
+
+	keys = {svg_raster.cache_path(p.read_bytes(), 128, stub_backend) for p in samples}
+	keys.add(svg_raster.cache_path(path.read_bytes(), 128, "cairosvg"))
+	assert len(keys) == len(samples) + 1
+
+	copy = tmp_path/"renamed.svg"
+	copy.write_bytes(path.read_bytes())
+	assert svg_raster.cache_path(copy.read_bytes(), 128, stub_backend) == cached
+
+
+def test_iter_grains_keeps_order(stub_backend):
+	names = [name for name, _, _ in svg_raster.iter_grains(samples, 64, stub_backend, workers=1)]
+	assert names == [p.stem for p in samples]
+
+
+def test_build_from_svgs_builds_a_set(stub_backend, tmp_path, monkeypatch):
+	import creator2
+	monkeypatch.setattr(creator2, "outdir", tmp_path)
+	monkeypatch.setattr(creator2, "setdir", tmp_path)
+	selection = "|".join(re.escape(p.stem) for p in samples)
+	brush_ids = svg_raster.build_from_svgs("stub set", pattern=selection, max_edge=64, backend=stub_backend, workers=1, memory_budget_mb=1)
+	assert brush_ids == [re.sub(r"-K$", "", p.stem) for p in samples]
+	assert (tmp_path/"stub set.brushset").exists()
+
+
+def render_failing(svg_bytes, size):
+	if svg_bytes == samples[1].read_bytes():
+		raise ValueError("unsupported element")
+	return render_stub(svg_bytes, size)
+
+
+def test_build_from_svgs_skips_failed_patterns(stub_backend, tmp_path, monkeypatch):
+	import creator2
+	svg_raster.register_backend("failing")(render_failing)
+	monkeypatch.setattr(creator2, "outdir", tmp_path)
+	monkeypatch.setattr(creator2, "setdir", tmp_path)
+	selection = "|".join(re.escape(p.stem) for p in samples)
+	try:
+		brush_ids = svg_raster.build_from_svgs("partial set", pattern=selection, max_edge=64, backend="failing", workers=1, memory_budget_mb=1)
+	finally:
+		del svg_raster.BACKENDS["failing"]
+	assert brush_ids == [re.sub(r"-K$", "", p.stem) for p in samples if p != samples[1]]
+	assert (tmp_path/"partial set.brushset").exists()
@@ -0,0 +1,53 @@
+import numpy as np
+from PIL import Image
+
+import texture_filter
+
+SIZE = 256
+
+
+def stripes(freq, angle, seed):
+	"""Stripes plus noise over the same left-to-right lighting gradient."""
+	rng = np.random.default_rng(seed)
+	y, x = np.mgrid[0:SIZE, 0:SIZE]
+	wave = 40 * np.sin(2 * np.pi * freq * (x * np.cos(angle) + y * np.sin(angle)) / SIZE)
+	return Image.fromarray(np.clip(60 + x / SIZE * 120 + wave + rng.normal(0, 25, x.shape), 0, 255).astype(np.uint8))
+
+
+def sources(tmp_path, images):
+	paths = []
+	for i, (name, img) in enumerate(images, start=1):
+		path = tmp_path/f"{i}.{name}"
+		img.save(path)
+		paths.append((str(i), path))
+	return paths
+
+
+def test_textures_sharing_a_gradient_are_kept(tmp_path):
+	srcs = sources(tmp_path, [("png", stripes(6, 0.0, 1)), ("png", stripes(11, 0.5, 2)), ("png", stripes(17, 1.1, 3))])
+	kept, _, report = texture_filter.filter_sources(srcs, "drop", workers=1)
+	assert kept == srcs and report == []
+
+
+def test_near_duplicates_are_dropped(tmp_path):
+	original = stripes(6, 0.0, 1)
+	brighter = Image.fromarray(np.clip(np.asarray(original, dtype=int) + 12, 0, 255).astype(np.uint8))
+	srcs = sources(tmp_path, [
+		("png", original),
+		("jpg", original),
+		("png", original.resize((200, 200), Image.LANCZOS)),
+		("png", brighter),
+		("png", Image.new("L", (SIZE, SIZE), 128)),
+	])
+	kept, _, report = texture_filter.filter_sources(srcs, "drop", workers=1)
+	assert [brush_id for brush_id, _ in kept] == ["1"]
+	assert [row[2].split(" (")[0] for row in report] == ["near-duplicate of 1"] * 3 + ["blank"]
+
+
+def test_hash_match_alone_is_only_flagged(tmp_path, monkeypatch):
+	monkeypatch.setattr(texture_filter, "NEAR_DUPLICATE_BITS", 64)
+	srcs = sources(tmp_path, [("png", stripes(6, 0.0, 1)), ("png", stripes(17, 1.1, 3))])
+	kept, _, report = texture_filter.filter_sources(srcs, "drop", workers=1)
+	assert kept == srcs and report == []
+	_, _, report = texture_filter.filter_sources(srcs, "flag", workers=1)
+	assert report[0][2].startswith("possible near-duplicate of 1")
@@ -0,0 +1,67 @@
+import struct
+import zipfile
+
+import validate_brushset
+
+MEMBERS = {
+	"Brush.archive": validate_brushset.PLIST_MAGIC + b"\0" * 32,
+	"Grain.png": validate_brushset.PNG_MAGIC + b"\0" * 32,
+	"QuickLook/Thumbnail.png": validate_brushset.PNG_MAGIC + b"\0" * 32,
+	"Signature/SignaturePicture.png": validate_brushset.PNG_MAGIC + b"\0" * 32,
+}
+
+
+def write_brush(path):
+	with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+		for name, data in MEMBERS.items():
+			zf.writestr(name, data)
+	return path
+
+
+def patch_headers(path, member, flags=None, method=None):
+	"""Rewrite a member's flags/compression method in both its local and central header."""
+	data = bytearray(path.read_bytes())
+	with zipfile.ZipFile(path) as zf:
+		info = zf.getinfo(member)
+	central = data.index(b"PK\x01\x02")
+	while True:
+		name_length = struct.unpack_from("<H", data, central + 28)[0]
+		if data[central + 46:central + 46 + name_length] == member.encode():
+			break
+		central = data.index(b"PK\x01\x02", central + 4)
+	local = info.header_offset
+	for offset in (local + 6, central + 8):
+		if flags is not None:
+			struct.pack_into("<H", data, offset, flags)
+		if method is not None:
+			struct.pack_into("<H", data, offset + 2, method)
+	path.write_bytes(bytes(data))
+
+
+def test_valid_brush(tmp_path):
+	result = validate_brushset.validate(write_brush(tmp_path/"ok.brush"), deep=True)
+	assert result["errors"] == [] and result["brushes"] == 1
+
+
+def test_encrypted_member_is_an_error(tmp_path):
+	path = write_brush(tmp_path/"encrypted.brush")
+	patch_headers(path, "Grain.png", flags=0x1)
+	result = validate_brushset.validate(path, deep=True)
+	assert any("Grain.png can't be read" in e for e in result["errors"])
+
+
+def test_unsupported_compression_is_an_error(tmp_path):
+	path = write_brush(tmp_path/"method.brush")
+	patch_headers(path, "Brush.archive", method=99)
+	result = validate_brushset.validate(path)
+	assert any("Brush.archive can't be read" in e for e in result["errors"])
+
+
+def test_batch_reports_every_file(tmp_path):
+	for i in range(6):
+		write_brush(tmp_path/f"{i}.brush")
+	patch_headers(tmp_path/"2.brush", "Grain.png", flags=0x1)
+	patch_headers(tmp_path/"4.brush", "Grain.png", method=99)
+	results = validate_brushset.validate_all([tmp_path], workers=2, deep=True)
+	assert len(results) == 6
+	assert [bool(r["errors"]) for r in results] == [False, False, True, False, True, False]